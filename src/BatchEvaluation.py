@@ -0,0 +1,221 @@
+"""
+Evaluation of many positions at once with NumPy. The boards are packed into an (N, 64) array of piece codes or an
+(N, 12, 64) array of piece planes, and the material, piece-square and mobility terms of all of them are computed
+with a few array operations instead of calling an evaluation function for each position.
+Run it from the repository root to compare it with evaluating the positions one by one from scratch, e.g.
+    python -m src.BatchEvaluation --positions 20000
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from .ChessEngine import (PIECES, ENDGAME_SCORES, MIDDLEGAME_SCORES, PHASE_WEIGHTS, MAX_PHASE, KNIGHT_ATTACKS,
+                          KING_ATTACKS, ROOK_RAYS, BISHOP_RAYS, START_FEN, GameState)
+
+# the code of a vacant square is 0, the code of a piece its index in PIECES plus 1
+PIECE_CODES = {"--": 0}
+PIECE_CODES.update({piece: code + 1 for code, piece in enumerate(PIECES)})
+# the code of each piece name by its two characters as a 16 bit number, to look up the codes of a whole array
+CODE_LOOKUP = np.zeros(1 << 16, dtype=np.uint8)
+for name, code in PIECE_CODES.items():
+    CODE_LOOKUP[ord(name[0]) << 8 | ord(name[1])] = code
+
+# the score tables of GameState.evaluate by piece code and square, from the point of view of white
+MIDDLEGAME_TABLE = np.array([[0] * 64] + [MIDDLEGAME_SCORES[piece] for piece in PIECES], dtype=np.int64)
+ENDGAME_TABLE = np.array([[0] * 64] + [ENDGAME_SCORES[piece] for piece in PIECES], dtype=np.int64)
+PHASE_TABLE = np.array([0] + [PHASE_WEIGHTS[piece[1]] for piece in PIECES], dtype=np.int64)
+SQUARE_INDICES = np.arange(64)
+
+
+def attackMatrix(masks):
+    """
+    :param masks: a bitboard of target squares for each square
+    :return: a (64, 64) array, row i holds the targets of a piece on square i
+    :rtype: np.ndarray
+    """
+    bits = np.array(masks, dtype=np.uint64).view(np.uint8).reshape(64, 8)
+    return np.unpackbits(bits, axis=1, bitorder="little").astype(np.float32)
+
+
+def emptyBoardAttacks(rays):
+    return [sum(raysOfDirection[index] for raysOfDirection, positive in rays) for index in range(64)]
+
+
+# the squares each piece type attacks on an empty board, the mobility terms count those not occupied by own pieces
+ATTACK_MATRICES = {
+    'N': attackMatrix(KNIGHT_ATTACKS),
+    'B': attackMatrix(emptyBoardAttacks(BISHOP_RAYS)),
+    'R': attackMatrix(emptyBoardAttacks(ROOK_RAYS)),
+    'Q': attackMatrix([rook | bishop for rook, bishop in zip(emptyBoardAttacks(ROOK_RAYS),
+                                                             emptyBoardAttacks(BISHOP_RAYS))]),
+    'K': attackMatrix(KING_ATTACKS),
+}
+# the bonus for each target square of a piece in centipawns
+MOBILITY_WEIGHTS = {'p': 0, 'N': 4, 'B': 3, 'R': 2, 'Q': 1, 'K': 0}
+
+
+def textToArray(text):
+    """
+    Converts the joined piece names of N boards to piece codes. NumPy converts the bytes of the string as a whole,
+    so there is no loop over the squares in Python.
+    :param text: the 64 piece names of each board, all joined to one string
+    :return: an (N, 64) array of piece codes, see PIECE_CODES
+    :rtype: np.ndarray
+    """
+    characters = np.frombuffer(text.encode("ascii"), dtype=np.uint8).reshape(-1, 64, 2).astype(np.uint16)
+    return CODE_LOOKUP[characters[:, :, 0] << 8 | characters[:, :, 1]]
+
+
+def squaresToArray(squareLists):
+    """
+    Converts flat boards (like GameState.squares) to piece codes.
+    :param squareLists: a sequence of N lists of 64 piece names
+    :return: an (N, 64) array of piece codes, see PIECE_CODES
+    :rtype: np.ndarray
+    """
+    return textToArray("".join(["".join(squares) for squares in squareLists]))
+
+
+def boardsToArray(boards):
+    """
+    :param boards: a sequence of N boards as lists of 8 rows of 8 piece names, like GameState.board
+    :return: an (N, 64) array of piece codes
+    :rtype: np.ndarray
+    """
+    return textToArray("".join(["".join(["".join(row) for row in board]) for board in boards]))
+
+
+def gameStatesToArray(gameStates):
+    """
+    :return: an (N, 64) array of piece codes of the boards of the GameStates, and an (N,) bool array which is True
+    where white is to move
+    :rtype: tuple
+    """
+    codes = squaresToArray([gs.squares for gs in gameStates])
+    return codes, np.array([gs.whiteToMove for gs in gameStates], dtype=bool)
+
+
+def bitboardsToPlanes(gameStates):
+    """
+    Unpacks the bitboards of the GameStates into piece planes.
+    :return: an (N, 12, 64) array of 0 and 1, plane p is 1 on the squares of the piece PIECES[p]
+    :rtype: np.ndarray
+    """
+    bitboards = np.array([[gs.bitboards[piece] for piece in PIECES] for gs in gameStates],
+                         dtype=np.uint64).reshape(-1, 12)
+    bits = bitboards.view(np.uint8).reshape(-1, 12, 8)
+    return np.unpackbits(bits, axis=2, bitorder="little")
+
+
+def codesToPlanes(codes):
+    """
+    :param codes: an (N, 64) array of piece codes
+    :return: an (N, 12, 64) array of 0 and 1, see bitboardsToPlanes
+    :rtype: np.ndarray
+    """
+    return (codes[:, None, :] == np.arange(1, 13, dtype=codes.dtype)[None, :, None]).astype(np.uint8)
+
+
+def mobility(planes):
+    """
+    A proxy of the mobility of the pieces that ignores blocking pieces: the number of squares each knight, bishop,
+    rook, queen and king would attack on an empty board that aren't occupied by pieces of its own color, weighted by
+    MOBILITY_WEIGHTS.
+    :param planes: an (N, 12, 64) array of piece planes
+    :return: an (N,) array of the mobility score from the point of view of white
+    :rtype: np.ndarray
+    """
+    planes = planes.astype(np.float32)
+    vacant = {'w': 1 - planes[:, :6].sum(axis=1), 'b': 1 - planes[:, 6:].sum(axis=1)}
+    score = np.zeros(len(planes), dtype=np.float32)
+    for plane, piece in enumerate(PIECES):
+        weight = MOBILITY_WEIGHTS[piece[1]] if piece[0] == 'w' else -MOBILITY_WEIGHTS[piece[1]]
+        if not weight or not planes[:, plane].any():
+            continue
+        # the number of the pieces attacking each square, as a matrix product so that NumPy does the work
+        targets = planes[:, plane] @ ATTACK_MATRICES[piece[1]]
+        score += weight * np.einsum("nk,nk->n", targets, vacant[piece[0]])
+    return score.astype(np.int64)
+
+
+def evaluateCodes(codes, whiteToMove=None, withMobility=True):
+    """
+    Evaluates the positions like GameState.evaluate, optionally plus the mobility proxy.
+    :param codes: an (N, 64) array of piece codes
+    :param whiteToMove: an (N,) bool array, the scores are from the point of view of the player to move; if None
+    they are from the point of view of white
+    :return: an (N,) array of scores in centipawns
+    :rtype: np.ndarray
+    """
+    middlegame = MIDDLEGAME_TABLE[codes, SQUARE_INDICES].sum(axis=1)
+    endgame = ENDGAME_TABLE[codes, SQUARE_INDICES].sum(axis=1)
+    phase = np.minimum(PHASE_TABLE[codes].sum(axis=1), MAX_PHASE)
+    scores = (middlegame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
+    if withMobility:
+        scores += mobility(codesToPlanes(codes))
+    if whiteToMove is not None:
+        scores = np.where(whiteToMove, scores, -scores)
+    return scores
+
+
+def evaluateBatch(gameStates, withMobility=True):
+    """
+    :return: an (N,) array of the scores of the GameStates from the point of view of the player to move
+    :rtype: np.ndarray
+    """
+    codes, whiteToMove = gameStatesToArray(gameStates)
+    return evaluateCodes(codes, whiteToMove, withMobility)
+
+
+def randomGameStates(count, seed=0, maxPlies=60):
+    """
+    :return: a list of positions reached by random moves from the start position
+    :rtype: list
+    """
+    rng = random.Random(seed)
+    gameStates = []
+    while len(gameStates) < count:
+        gs = GameState()
+        gs.setFen(START_FEN)
+        for ply in range(rng.randrange(maxPlies)):
+            if not gs.validMoves:
+                break
+            gs.makeMove(rng.choice(gs.validMoves))
+        gameStates.append(gs)
+    return gameStates
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Compare the batch evaluation with evaluating one by one.")
+    parser.add_argument("--positions", type=int, default=10000)
+    args = parser.parse_args(args)
+    gameStates = randomGameStates(min(args.positions, 500))
+    gameStates = [gameStates[index % len(gameStates)] for index in range(args.positions)]
+
+    def evaluateFromScratch(gs):
+        middlegameScore, endgameScore, phase = gs.calculateEvaluationTerms()
+        phase = min(phase, MAX_PHASE)
+        score = (middlegameScore * phase + endgameScore * (MAX_PHASE - phase)) // MAX_PHASE
+        return score if gs.whiteToMove else -score
+
+    # boards read from a file have no incrementally kept terms, one by one they have to be evaluated from scratch
+    start = time.perf_counter()
+    single = [evaluateFromScratch(gs) for gs in gameStates]
+    singleTime = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = evaluateBatch(gameStates, withMobility=False)
+    batchTime = time.perf_counter() - start
+    start = time.perf_counter()
+    evaluateBatch(gameStates)
+    mobilityTime = time.perf_counter() - start
+    print(f"one by one:           {singleTime:.3f}s")
+    print(f"batch:                {batchTime:.3f}s, scores equal: {list(batch) == single}")
+    print(f"batch with mobility:  {mobilityTime:.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,10 +8,305 @@
 # about the possible moves the opponent could to after we executed myMove
 # these possible moves of the opponent may also result into putting the opponent into check,
 # because they don't actually have to be executed in order to check us.
+# Besides the board, the GameState keeps one bitboard per piece: a 64 bit integer in which the bit with the index
+# row * 8 + col is set if the piece stands on the square (col, row). So bit 0 is a8 and bit 63 is h1, which is the
+# same order in which the fields appear in the board. The board is also kept as one flat list, squares, indexed by
+# bit index. The moves are generated by walking squares with the precomputed target lists (KNIGHT_TARGETS,
+# KING_TARGETS, PAWN_TARGETS) and rays (SLIDER_RAY_SQUARES), and the attacks on a square are looked up the same way
+# from the square outwards, see isAttackedBy. The bitboards serve the check and pin detection and the evaluation.
 
-import copy
+import random
+from array import array
+from collections import OrderedDict
 from collections.abc import Iterable
 
+PIECES = ("wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK")
+# the pieces of one color, always in the order pawn, knight, bishop, rook, queen, king
+COLOR_PIECES = {"w": PIECES[:6], "b": PIECES[6:]}
+OPPONENT = {"w": "b", "b": "w"}
+# the material value of the piece types in centipawns, the king can't be traded
+PIECE_VALUES = {'p': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900, 'K': 0}
+
+KNIGHT_STEPS = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+KING_STEPS = ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1))
+ROOK_DIRECTIONS = ((1, 0), (0, 1), (-1, 0), (0, -1))
+BISHOP_DIRECTIONS = ((1, 1), (-1, 1), (-1, -1), (1, -1))
+
+FIRST_ROW = 0xFF  # row 0, the 8th rank
+LAST_ROW = 0xFF << 56  # row 7, the 1st rank
+ALL_SQUARES = (1 << 64) - 1
+LIGHT_SQUARES = sum(1 << index for index in range(64) if (index % 8 + index // 8) % 2 == 0)  # a8 is light
+DARK_SQUARES = ALL_SQUARES ^ LIGHT_SQUARES
+
+# Move.flags
+EN_PASSANT = 1
+CASTLING = 2
+# the start squares of the rooks and kings, by bit index, with their keys in GameState.piecesMoved
+FIRST_MOVE_SQUARES = {0: "bLR", 7: "bRR", 4: "bK", 56: "wLR", 63: "wRR", 60: "wK"}
+# the bit index of the king's destination of each castling move, with the bit indices the rook moves from and to
+CASTLING_ROOK_MOVES = {58: (56, 59), 62: (63, 61), 2: (0, 3), 6: (7, 5)}
+
+# the position at the start of a game in Forsyth-Edwards Notation, see GameState.setFen
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# the history of a game: the board is saved before every that many moves, the boards in between are replayed from
+# the last saved one, see GameState.getBoardBeforeMove
+CHECKPOINT_INTERVAL = 16
+# only the undo entries of that many last moves keep the move lists of their position, see GameState.makeMove
+UNDO_CACHE_PLIES = 32
+# the number of moves (plies) without a capture or a pawn move after which the game is drawn
+FIFTY_MOVE_PLIES = 100
+
+
+def squareToIndex(square):
+    return square[1] * 8 + square[0]
+
+
+def indexToSquare(index):
+    return index % 8, index // 8
+
+
+SQUARES = [indexToSquare(index) for index in range(64)]
+
+
+def iterateBits(bitboard):
+    """
+    Yields the indices of the set bits of a bitboard, starting with the lowest.
+    """
+    while bitboard:
+        lowestBit = bitboard & -bitboard
+        yield lowestBit.bit_length() - 1
+        bitboard ^= lowestBit
+
+
+def stepTargets(index, steps):
+    """
+    :return: a bitboard of the squares that can be reached from the square with the given index by doing one of the
+    given (col_step, row_step) steps without leaving the board
+    :rtype: int
+    """
+    col, row = indexToSquare(index)
+    targets = 0
+    for colStep, rowStep in steps:
+        if 0 <= col + colStep < 8 and 0 <= row + rowStep < 8:
+            targets |= 1 << squareToIndex((col + colStep, row + rowStep))
+    return targets
+
+
+def rayTargets(index, direction):
+    """
+    :return: a bitboard of all the squares from the square with the given index (exclusive) to the edge of the board
+    in the given direction
+    :rtype: int
+    """
+    col, row = indexToSquare(index)
+    targets = 0
+    col, row = col + direction[0], row + direction[1]
+    while 0 <= col < 8 and 0 <= row < 8:
+        targets |= 1 << squareToIndex((col, row))
+        col, row = col + direction[0], row + direction[1]
+    return targets
+
+
+# Zobrist hashing: the hash of a position is the xor of one random number for each piece on its square, one if black
+# is at turn, one for each rook or king that has been moved and one for the column of the e.p. square
+zobristRandom = random.Random(2020)
+ZOBRIST_PIECES = {piece: [zobristRandom.getrandbits(64) for index in range(64)] for piece in PIECES}
+ZOBRIST_BLACK_TO_MOVE = zobristRandom.getrandbits(64)
+ZOBRIST_PIECES_MOVED = {key: zobristRandom.getrandbits(64) for key in ("wK", "wLR", "wRR", "bK", "bLR", "bRR")}
+ZOBRIST_EN_PASSANT = [zobristRandom.getrandbits(64) for col in range(8)]
+
+# Evaluation: material plus a bonus for the square of each piece, with different values in the middlegame and the
+# endgame. The tables are seen from white, the first row is the 8th rank. The evaluation blends the two by the game
+# phase, which is the sum of the phase weights of the pieces on the board, 24 at the start of the game.
+MIDDLEGAME_VALUES = {'p': 82, 'N': 337, 'B': 365, 'R': 477, 'Q': 1025, 'K': 0}
+ENDGAME_VALUES = {'p': 94, 'N': 281, 'B': 297, 'R': 512, 'Q': 936, 'K': 0}
+PHASE_WEIGHTS = {'p': 0, 'N': 1, 'B': 1, 'R': 2, 'Q': 4, 'K': 0}
+MAX_PHASE = 24
+PAWN_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0)
+PAWN_ENDGAME_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    80, 80, 80, 80, 80, 80, 80, 80,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    30, 30, 30, 30, 30, 30, 30, 30,
+    15, 15, 15, 15, 15, 15, 15, 15,
+    5, 5, 5, 5, 5, 5, 5, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0)
+KNIGHT_TABLE = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50)
+BISHOP_TABLE = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20)
+ROOK_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0)
+QUEEN_TABLE = (
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20)
+KING_TABLE = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20)
+KING_ENDGAME_TABLE = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50)
+MIDDLEGAME_TABLES = {'p': PAWN_TABLE, 'N': KNIGHT_TABLE, 'B': BISHOP_TABLE, 'R': ROOK_TABLE, 'Q': QUEEN_TABLE,
+                     'K': KING_TABLE}
+ENDGAME_TABLES = {'p': PAWN_ENDGAME_TABLE, 'N': KNIGHT_TABLE, 'B': BISHOP_TABLE, 'R': ROOK_TABLE, 'Q': QUEEN_TABLE,
+                  'K': KING_ENDGAME_TABLE}
+
+
+def pieceSquareScores(values, tables):
+    """
+    :return: for each piece the score of the piece on each bit index including its material value, from the point of
+    view of white. The tables of black are mirrored vertically and negated.
+    :rtype: dict
+    """
+    scores = {}
+    for piece in PIECES:
+        table = tables[piece[1]]
+        if piece[0] == 'w':
+            scores[piece] = [values[piece[1]] + table[index] for index in range(64)]
+        else:
+            scores[piece] = [-values[piece[1]] - table[index ^ 56] for index in range(64)]
+    return scores
+
+
+MIDDLEGAME_SCORES = pieceSquareScores(MIDDLEGAME_VALUES, MIDDLEGAME_TABLES)
+ENDGAME_SCORES = pieceSquareScores(ENDGAME_VALUES, ENDGAME_TABLES)
+
+KNIGHT_ATTACKS = [stepTargets(index, KNIGHT_STEPS) for index in range(64)]
+KING_ATTACKS = [stepTargets(index, KING_STEPS) for index in range(64)]
+# the squares attacked by a pawn of the given color standing on a square
+PAWN_ATTACKS = {"w": [stepTargets(index, ((-1, -1), (1, -1))) for index in range(64)],
+                "b": [stepTargets(index, ((-1, 1), (1, 1))) for index in range(64)]}
+# for each direction the rays of all the squares, together with a flag telling if the ray runs towards higher bit
+# indices. In that case the blocker closest to the slider is the lowest set bit of the blockers on the ray,
+# otherwise the highest one.
+ROOK_RAYS = [([rayTargets(index, direction) for index in range(64)], direction[0] + 8 * direction[1] > 0)
+             for direction in ROOK_DIRECTIONS]
+BISHOP_RAYS = [([rayTargets(index, direction) for index in range(64)], direction[0] + 8 * direction[1] > 0)
+               for direction in BISHOP_DIRECTIONS]
+
+
+def closestBit(blockers, positive):
+    """
+    :return: the index of the blocker closest to the origin of a ray running towards higher (positive) or lower bit
+    indices
+    :rtype: int
+    """
+    if positive:
+        return (blockers & -blockers).bit_length() - 1
+    return blockers.bit_length() - 1
+
+
+def raySquares(index, direction):
+    """
+    :return: the bit indices of the squares from the square with the given index (exclusive) to the edge of the board
+    in the given direction, ordered from the square outwards
+    :rtype: list
+    """
+    col, row = indexToSquare(index)
+    squares = []
+    col, row = col + direction[0], row + direction[1]
+    while 0 <= col < 8 and 0 <= row < 8:
+        squares.append(squareToIndex((col, row)))
+        col, row = col + direction[0], row + direction[1]
+    return squares
+
+
+# The same tables as flat lists of bit indices per square, which are faster to walk over the flat board
+# GameState.squares than iterating the bits of the bitboards
+KNIGHT_TARGETS = [list(iterateBits(targets)) for targets in KNIGHT_ATTACKS]
+KING_TARGETS = [list(iterateBits(targets)) for targets in KING_ATTACKS]
+PAWN_TARGETS = {color: [list(iterateBits(targets)) for targets in PAWN_ATTACKS[color]] for color in "wb"}
+ROOK_RAY_SQUARES = [[raySquares(index, direction) for direction in ROOK_DIRECTIONS] for index in range(64)]
+BISHOP_RAY_SQUARES = [[raySquares(index, direction) for direction in BISHOP_DIRECTIONS] for index in range(64)]
+QUEEN_RAY_SQUARES = [ROOK_RAY_SQUARES[index] + BISHOP_RAY_SQUARES[index] for index in range(64)]
+SLIDER_RAY_SQUARES = {'R': ROOK_RAY_SQUARES, 'B': BISHOP_RAY_SQUARES, 'Q': QUEEN_RAY_SQUARES}
+
+
+def slidingAttacks(index, occupied, rays):
+    """
+    :return: a bitboard of the squares a slider on the square with the given index attacks along the given rays,
+    including the first occupied square on each ray
+    :rtype: int
+    """
+    attacks = 0
+    for ray, positive in rays:
+        targets = ray[index]
+        blockers = targets & occupied
+        if blockers:
+            targets ^= ray[closestBit(blockers, positive)]
+        attacks |= targets
+    return attacks
+
+
+def squaresBetween(fromIndex, toIndex):
+    """
+    :return: a bitboard of the squares between two squares on a common row, column or diagonal, including the second
+    square. 0 if the squares don't share a line.
+    :rtype: int
+    """
+    for ray, positive in ROOK_RAYS + BISHOP_RAYS:
+        if ray[fromIndex] >> toIndex & 1:
+            return ray[fromIndex] ^ ray[toIndex]
+    return 0
+
+
+def rookAttacks(index, occupied):
+    return slidingAttacks(index, occupied, ROOK_RAYS)
+
+
+def bishopAttacks(index, occupied):
+    return slidingAttacks(index, occupied, BISHOP_RAYS)
+
+
 class GameState:
     """
     This class is responsible for storing all the information about the current state of a chess game and for
@@ -19,6 +314,36 @@ class GameState:
     """
 
     def __init__(self):
+        self.whiteToMove = True
+        self.moveLog = []
+        # an optional incrementally updated evaluation, see setPieceAt and NeuralEvaluation.Accumulator
+        self.accumulator = None
+        # an optional MoveCache of the valid moves of the positions seen, see updateValidMoves
+        self.moveCache = None
+        # for each move in the log the state before it, see makeMove
+        self.undoStack = []
+        # the number of moves since the last capture or pawn move, for the fifty-move rule and the repetitions
+        self.halfmoveClock = 0
+        # the hashes of the positions before the first move of the log since the last capture or pawn move, which a
+        # clone without history takes over, see isRepetition
+        self.previousHashes = []
+        # the flat board before every CHECKPOINT_INTERVAL-th move of the log, see getBoardBeforeMove
+        self.checkpoints = []
+        # the possible and valid moves are calculated on demand and cached until the position changes
+        self.possibleMoves = None
+        self.validMoves = None
+        self.enPassantSquare = None  # here a tuple should be stored representing the square a pawn omitted so that an
+        # opponent's pawn can capture this pawn via en passant by checking if this variable is set
+        # it is reset to None in the very next move because en passant is only allowed immediately
+        self.piecesMoved = {"wK": False,  # white king
+                            "wLR": False,  # white left rook
+                            "wRR": False,  # white right rook
+                            "bK": False,  # and so on
+                            "bLR": False,
+                            "bRR": False}  # keeping track if the rooks or kings have been moved to see if
+        # castling is possible
+
+        # the board needs to be assigned last, because the hash of the position is calculated on assignment
         # the first char represents the color of the piece 'b' or 'w'
         # the second char represents the type of the piece 'K', 'Q', 'B', 'N', 'R' or 'p'
         # "--" represents a vacant field
@@ -42,28 +367,165 @@ class GameState:
             ['wp', 'wp', 'wp', '--', '--', 'wp', 'wp', 'wp'],
             ['wR', '--', 'wB', '--', 'wK', 'wB', '--', 'wR']
         ]
-        self.whiteToMove = True
-        self.moveLog = []
-        self.possibleMoves = []
-        self.validMoves = []
-        self.enPassantSquare = None  # here a tuple should be stored representing the square a pawn omitted so that an
-        # opponent's pawn can capture this pawn via en passant by checking if this variable is set
-        # it is reset to None in the very next move because en passant is only allowed immediately
-        self.piecesMoved = {"wK": False,  # white king
-                            "wLR": False,  # white left rook
-                            "wRR": False,  # white right rook
-                            "bK": False,  # and so on
-                            "bLR": False,
-                            "bRR": False}  # keeping track if the rooks or kings have been moved to see if
-        # castling is possible
-        self.updatePossibleMoves()
-        self.updateValidMoves()
 
     def getPieceAt(self, col, row):
         return self.board[row][col]
 
     def setPieceAt(self, col, row, piece):
-        self.board[row][col] = piece
+        bit = 1 << (row * 8 + col)
+        oldPiece = self._board[row][col]
+        if oldPiece != "--":
+            self.bitboards[oldPiece] ^= bit
+            self.colorBitboards[oldPiece[0]] ^= bit
+            self.hash ^= ZOBRIST_PIECES[oldPiece][row * 8 + col]
+            if oldPiece[1] == 'p':
+                self.pawnHash ^= ZOBRIST_PIECES[oldPiece][row * 8 + col]
+            self.middlegameScore -= MIDDLEGAME_SCORES[oldPiece][row * 8 + col]
+            self.endgameScore -= ENDGAME_SCORES[oldPiece][row * 8 + col]
+            self.phase -= PHASE_WEIGHTS[oldPiece[1]]
+            if self.accumulator is not None:
+                self.accumulator.removePiece(oldPiece, row * 8 + col)
+        if piece != "--":
+            self.bitboards[piece] |= bit
+            self.colorBitboards[piece[0]] |= bit
+            self.hash ^= ZOBRIST_PIECES[piece][row * 8 + col]
+            if piece[1] == 'p':
+                self.pawnHash ^= ZOBRIST_PIECES[piece][row * 8 + col]
+            self.middlegameScore += MIDDLEGAME_SCORES[piece][row * 8 + col]
+            self.endgameScore += ENDGAME_SCORES[piece][row * 8 + col]
+            self.phase += PHASE_WEIGHTS[piece[1]]
+            if self.accumulator is not None:
+                self.accumulator.addPiece(piece, row * 8 + col)
+        self._board[row][col] = piece
+        self.squares[row * 8 + col] = piece
+
+    def setEnPassantSquare(self, square):
+        if self.enPassantSquare is not None:
+            self.hash ^= ZOBRIST_EN_PASSANT[self.enPassantSquare[0]]
+        if square is not None:
+            self.hash ^= ZOBRIST_EN_PASSANT[square[0]]
+        self.enPassantSquare = square
+
+    def setPieceMoved(self, key, moved):
+        if self.piecesMoved[key] != moved:
+            self.hash ^= ZOBRIST_PIECES_MOVED[key]
+        self.piecesMoved[key] = moved
+
+    def calculateHash(self):
+        """
+        Calculates the Zobrist hash of the position from scratch. It covers the pieces on the board, the player at
+        turn, the rooks and kings that have been moved and the column of the e.p. square. The hash is kept up to date
+        incrementally in the attribute hash, so this is only needed when the position is replaced as a whole.
+        :return: a 64 bit integer
+        :rtype: int
+        """
+        positionHash = 0
+        for piece in PIECES:
+            for index in iterateBits(self.bitboards[piece]):
+                positionHash ^= ZOBRIST_PIECES[piece][index]
+        if not self.whiteToMove:
+            positionHash ^= ZOBRIST_BLACK_TO_MOVE
+        for key, moved in self.piecesMoved.items():
+            if moved:
+                positionHash ^= ZOBRIST_PIECES_MOVED[key]
+        if self.enPassantSquare is not None:
+            positionHash ^= ZOBRIST_EN_PASSANT[self.enPassantSquare[0]]
+        return positionHash
+
+    def calculatePawnHash(self):
+        """
+        Calculates the Zobrist hash of only the pawns on the board from scratch, the key of the pawn structure. It is
+        kept up to date incrementally in the attribute pawnHash.
+        :return: a 64 bit integer
+        :rtype: int
+        """
+        pawnHash = 0
+        for piece in ("wp", "bp"):
+            for index in iterateBits(self.bitboards[piece]):
+                pawnHash ^= ZOBRIST_PIECES[piece][index]
+        return pawnHash
+
+    def calculateEvaluationTerms(self):
+        """
+        Calculates the terms of the evaluation from scratch. Like the hash, they are kept up to date incrementally by
+        setPieceAt, so this is only needed when the position is replaced as a whole.
+        :return: the tuple (middlegameScore, endgameScore, phase)
+        :rtype: tuple
+        """
+        middlegameScore = endgameScore = phase = 0
+        for piece in PIECES:
+            for index in iterateBits(self.bitboards[piece]):
+                middlegameScore += MIDDLEGAME_SCORES[piece][index]
+                endgameScore += ENDGAME_SCORES[piece][index]
+                phase += PHASE_WEIGHTS[piece[1]]
+        return middlegameScore, endgameScore, phase
+
+    def evaluate(self):
+        """
+        Evaluates the position by material and piece squares, blending the middlegame and the endgame scores by the
+        phase of the game. Only combines the incrementally kept terms, so it takes constant time.
+        :return: the score in centipawns from the point of view of the current player
+        :rtype: int
+        """
+        phase = min(self.phase, MAX_PHASE)
+        score = (self.middlegameScore * phase + self.endgameScore * (MAX_PHASE - phase)) // MAX_PHASE
+        return score if self.whiteToMove else -score
+
+    @property
+    def board(self):
+        return self._board
+
+    @board.setter
+    def board(self, board):
+        """
+        Replaces the board and rebuilds the bitboards from it.
+        """
+        self._board = board
+        # the board as one flat list, indexed by bit index
+        self.squares = [piece for row in board for piece in row]
+        self.bitboards = dict.fromkeys(PIECES, 0)
+        self.colorBitboards = {"w": 0, "b": 0}
+        for row in range(8):
+            for col in range(8):
+                piece = board[row][col]
+                if piece != "--":
+                    self.bitboards[piece] |= 1 << (row * 8 + col)
+                    self.colorBitboards[piece[0]] |= 1 << (row * 8 + col)
+        self.hash = self.calculateHash()
+        self.pawnHash = self.calculatePawnHash()
+        self.middlegameScore, self.endgameScore, self.phase = self.calculateEvaluationTerms()
+        if self.accumulator is not None:
+            self.accumulator.refresh(self)
+        self.possibleMoves = None
+        self.validMoves = None
+
+    @property
+    def possibleMoves(self):
+        """
+        The possible moves of both colors, calculated by updatePossibleMoves when they are needed for the first time
+        since the last change of the position.
+        """
+        if self._possibleMoves is None:
+            self.updatePossibleMoves()
+        return self._possibleMoves
+
+    @possibleMoves.setter
+    def possibleMoves(self, possibleMoves):
+        self._possibleMoves = possibleMoves
+
+    @property
+    def validMoves(self):
+        """
+        The valid moves of the current player, calculated by updateValidMoves when they are needed for the first time
+        since the last change of the position.
+        """
+        if self._validMoves is None:
+            self.updateValidMoves()
+        return self._validMoves
+
+    @validMoves.setter
+    def validMoves(self, validMoves):
+        self._validMoves = validMoves
 
     def calculatePossibleMoves(self, fromSq):
         """
@@ -81,149 +543,74 @@ class GameState:
         fromCol = fromSq[0]
         fromRow = fromSq[1]
         pieceMoved = self.getPieceAt(fromCol, fromRow)
+        if pieceMoved == "--":
+            return possibleMoves
+        index = fromRow * 8 + fromCol
+        color = pieceMoved[0]
+        squares = self.squares
 
         # Pawn
         if pieceMoved[1] == 'p':
             # check if pawn is not on the finish row
-            if fromRow != (0 if pieceMoved[0] == 'w' else 7):
+            if fromRow != (0 if color == 'w' else 7):
                 # add the field in front of the pawn if it is vacant
-                rowInFrontOfPawn = fromRow - 1 if pieceMoved[0] == 'w' else fromRow + 1
-                pieceInFrontOfPawn = self.getPieceAt(fromCol, rowInFrontOfPawn)
-                if pieceInFrontOfPawn == "--":
+                rowInFrontOfPawn = fromRow - 1 if color == 'w' else fromRow + 1
+                inFrontOfPawnVacant = squares[rowInFrontOfPawn * 8 + fromCol] == "--"
+                if inFrontOfPawnVacant:
                     possibleMoves.append(Move(fromSq, (fromCol, rowInFrontOfPawn), self))
                 # add the two fields diagonally in front of the pawn if they have an opponent's piece on it
-                # or if they are vacant and an en passant is possible
-                for direction in (-1, 1):
-                    if fromCol + direction not in range(8):
-                        continue
-                    # check if they have an opponent's piece on it
-                    if self.getPieceAt(fromCol + direction, rowInFrontOfPawn)[0]not in (pieceMoved[0], '-'):
-                        possibleMoves.append(Move(fromSq, (fromCol + direction, rowInFrontOfPawn), self))
-                    # check if an enpassant is possible
-                    elif self.getPieceAt(fromCol + direction, rowInFrontOfPawn) == "--" and \
-                            (fromCol + direction, rowInFrontOfPawn) == self.enPassantSquare:
-                        possibleMoves.append(Move(fromSq, (fromCol + direction, rowInFrontOfPawn),
-                                                  self, enPassant=True))
+                for toIndex in PAWN_TARGETS[color][index]:
+                    if squares[toIndex][0] not in (color, '-'):
+                        possibleMoves.append(Move(fromSq, SQUARES[toIndex], self))
+                    # or if they are vacant and an en passant is possible
+                    elif squares[toIndex] == "--" and SQUARES[toIndex] == tuple(self.enPassantSquare or ()):
+                        possibleMoves.append(Move(fromSq, SQUARES[toIndex], self, enPassant=True))
                 # if the pawn is on the start row, add the field two steps ahead of it, if the two fields in front of
                 # the pawn are vacant
-                if fromRow == (6 if pieceMoved[0] == 'w' else 1):
-                    rowTwoAheadOfPawn = fromRow - 2 if pieceMoved[0] == 'w' else fromRow + 2
-                    pieceTwoAheadOfPawn = self.getPieceAt(fromCol, rowTwoAheadOfPawn)
-                    if pieceInFrontOfPawn == pieceTwoAheadOfPawn == "--":
+                if fromRow == (6 if color == 'w' else 1) and inFrontOfPawnVacant:
+                    rowTwoAheadOfPawn = fromRow - 2 if color == 'w' else fromRow + 2
+                    if squares[rowTwoAheadOfPawn * 8 + fromCol] == "--":
                         possibleMoves.append(Move(fromSq, (fromCol, rowTwoAheadOfPawn), self))
+            return possibleMoves
 
-        # Rook
-        elif pieceMoved[1] == 'R':
-            # each field ahead of the Rook (in all four parallel directions) until there is a collision
+        if pieceMoved[1] in "NK":
+            # each field the piece can step on, if it doesn't have a piece from the same color on it
+            for toIndex in (KNIGHT_TARGETS if pieceMoved[1] == 'N' else KING_TARGETS)[index]:
+                if squares[toIndex][0] != color:
+                    possibleMoves.append(Move(fromSq, SQUARES[toIndex], self))
+        else:
+            # each field on the rays of the slider until there is a collision
             # in case if collision, the colliding field is valid if it is an opponent's piece.
-            # we start by iterating the fields neighboring the piece except the diagonal neighbors
-            for direction in ((0, 1), (0, -1), (1, 0), (-1, 0)):
-                checkSq = fromSq
-                while True:
-                    checkSq = (checkSq[0] + direction[0], checkSq[1] + direction[1])
-                    # check if field is out of the board
-                    if not (checkSq[0] in range(8) and checkSq[1] in range(8)):
-                        break
-                    # check if there is a piece from the same color as the Rook
-                    if self.getPieceAt(checkSq[0], checkSq[1])[0] == pieceMoved[0]:
-                        break
-                    possibleMoves.append(Move(fromSq, (checkSq[0], checkSq[1]), self))
-                    # check if collision with opponent's piece
-                    if self.getPieceAt(checkSq[0], checkSq[1])[0] not in (pieceMoved[0], '-'):
+            for ray in SLIDER_RAY_SQUARES[pieceMoved[1]][index]:
+                for toIndex in ray:
+                    piece = squares[toIndex]
+                    if piece == "--":
+                        possibleMoves.append(Move(fromSq, SQUARES[toIndex], self))
+                    else:
+                        if piece[0] != color:
+                            possibleMoves.append(Move(fromSq, SQUARES[toIndex], self))
                         break
 
-        # Knight
-        elif pieceMoved[1] == 'N':
-            # iterate all the fields accessible for the knight
-            for col_step in (-2, -1, 1, 2):
-                for row_step in (-2, -1, 1, 2):
-                    if abs(row_step) == abs(col_step):
-                        continue  # knight can only go 2 and 1, not 2 and 2 or 1 and 1
-                    row = fromRow + row_step
-                    col = fromCol + col_step
-                    # continue if the field is out of the board
-                    if row not in range(8) or col not in range(8):
-                        continue
-                    # assure that there is not a piece from the same color as the knight
-                    if self.getPieceAt(col, row)[0] != pieceMoved[0]:
-                        possibleMoves.append(Move(fromSq, (col, row), self))
-
-        # Bishop
-        elif pieceMoved[1] == 'B':
-            # each field ahead of the Bishop (in all four diagonal directions) until there is a collision
-            # in case if collision, the colliding field is valid if it is an opponent's piece.
-            # we start by iterating the fields neighboring the piece diagonally
-            for col_step in (-1, 1):
-                for row_step in (-1, 1):
-                    checkSq = fromSq
-                    while True:
-                        checkSq = (checkSq[0] + col_step, checkSq[1] + row_step)
-                        # check if field is on the board
-                        if not (checkSq[0] in range(8) and checkSq[1] in range(8)):
-                            break
-                        # check if collision with own piece
-                        if self.getPieceAt(checkSq[0], checkSq[1])[0] == pieceMoved[0]:
-                            break
-                        possibleMoves.append(Move(fromSq, (checkSq[0], checkSq[1]), self))
-                        # check if collision with opponent's piece
-                        if self.getPieceAt(checkSq[0], checkSq[1])[0] not in (pieceMoved[0], '-'):
-                            break
-
-        # Queen
-        elif pieceMoved[1] == 'Q':
-            # each field ahead of the Queen (in all 8 directions) until there is a collision
-            # in case if collision, the colliding field is valid if it is an opponent's piece.
-            for col_step in (-1, 0, 1):  # Here we are iterating the fields neighboring the piece
-                for row_step in (-1, 0, 1):
-                    if col_step == row_step == 0:
-                        continue
-                    checkSq = fromSq
-                    while True:
-                        checkSq = (checkSq[0] + col_step, checkSq[1] + row_step)
-                        # check if field is out of the board
-                        if not (checkSq[0] in range(8) and checkSq[1] in range(8)):
-                            break
-                        # check if there is a piece from the same color as the Rook
-                        if self.getPieceAt(checkSq[0], checkSq[1])[0] == pieceMoved[0]:
-                            break
-                        possibleMoves.append(Move(fromSq, (checkSq[0], checkSq[1]), self))
-                        # check if collision with opponent's piece
-                        if self.getPieceAt(checkSq[0], checkSq[1])[0] not in (pieceMoved[0], '-'):
-                            break
-
         # King
-        elif pieceMoved[1] == 'K':
-            # each field next to the King if it doesn't have a piece from the same color as the King on it
-            for col_step in (-1, 0, 1):  # Here we are iterating the fields neighboring the piece
-                for row_step in (-1, 0, 1):
-                    if col_step == row_step == 0:
-                        continue
-                    checkSq = (fromSq[0] + col_step, fromSq[1] + row_step)
-                    # check if field is out of the board
-                    if not (checkSq[0] in range(8) and checkSq[1] in range(8)):
-                        continue
-                    # check if there is a piece from the same color as the King
-                    if self.getPieceAt(checkSq[0], checkSq[1])[0] == pieceMoved[0]:
-                        continue
-                    possibleMoves.append(Move(fromSq, (checkSq[0], checkSq[1]), self))
+        if pieceMoved[1] == 'K':
             # check if castling is possible
             if pieceMoved[0] == 'w' and not self.piecesMoved["wK"]:  # white king and hasn't moved yet
                 if not self.piecesMoved["wLR"] and self.getPieceAt(0, 7) == "wR":  # white left rook not moved yet
                     if all(self.getPieceAt(c, 7) == "--" for c in range(1, 4)):  # way between wLR and wK is free
-                        if all(not self.isUnderAttack((c, 7)) for c in range(0, 5)):  # none of the fields from wLR to wK are under attack
+                        if all(not self.isSquareAttacked((c, 7), 'b') for c in range(0, 5)):  # none of the fields from wLR to wK are under attack
                             possibleMoves.append(Move(fromSq, (2, 7), self, castling=True))
                 if not self.piecesMoved["wRR"] and self.getPieceAt(7, 7) == "wR":  # white right rook not moved yet
                     if all(self.getPieceAt(c, 7) == "--" for c in range(5, 7)):  # way between wRR and wK is free
-                        if all(not self.isUnderAttack((c, 7)) for c in range(4, 8)):  # none of the fields from wRR to wK are under attack
+                        if all(not self.isSquareAttacked((c, 7), 'b') for c in range(4, 8)):  # none of the fields from wRR to wK are under attack
                             possibleMoves.append(Move(fromSq, (6, 7), self, castling=True))
             elif pieceMoved[0] == 'b' and not self.piecesMoved["bK"]:  # black king not moved yet
                 if not self.piecesMoved["bLR"] and self.getPieceAt(0, 0) == "bR":  # black left rook not moved yet
                     if all(self.getPieceAt(c, 0) == "--" for c in range(1, 4)):  # way between bLR and bK is free
-                        if all(not self.isUnderAttack((c, 0)) for c in range(0, 5)):  # none of the fields from bLR to bK are under attack
+                        if all(not self.isSquareAttacked((c, 0), 'w') for c in range(0, 5)):  # none of the fields from bLR to bK are under attack
                             possibleMoves.append(Move(fromSq, (2, 0), self, castling=True))
                 if not self.piecesMoved["bRR"] and self.getPieceAt(7, 0) == "bR":  # black right rook not moved yet
                     if all(self.getPieceAt(c, 0) == "--" for c in range(5, 7)):  # way between bRR and bK is free
-                        if all(not self.isUnderAttack((c, 0)) for c in range(4, 8)):  # none of the fields from bRR to bK is under attack
+                        if all(not self.isSquareAttacked((c, 0), 'w') for c in range(4, 8)):  # none of the fields from bRR to bK is under attack
                             possibleMoves.append(Move(fromSq, (6, 0), self, castling=True))
 
         return possibleMoves
@@ -234,14 +621,13 @@ class GameState:
         1) from all the squares,
         2) for both colors,
         3) without regard to check.
-        Should only be called when a move was made in order to save performance.
+        Is called when the possible moves are accessed after the position has changed.
         :return:
         :rtype:
         """
         possibleMoves = []
-        for col in range(8):
-            for row in range(8):
-                possibleMoves += self.calculatePossibleMoves((col, row))
+        for index in iterateBits(self.colorBitboards["w"] | self.colorBitboards["b"]):
+            possibleMoves += self.calculatePossibleMoves(SQUARES[index])
         self.possibleMoves = possibleMoves
 
     def calculateValidMoves(self, fromSq):
@@ -255,29 +641,155 @@ class GameState:
         :return:
         :rtype:
         """
-        validMoves = []
-        for move in self.possibleMoves:
-            # check if the move starts at the specified square and if it is a piece of the player at turn
-            allyColor = 'w' if self.whiteToMove else 'b'
-            if move.fromSq == fromSq and move.pieceMoved[0] == allyColor:
-                # we make and undo the move to see if it puts us in check
-                boardBefore = copy.deepcopy(self.board)
-                self.makeMove(move, testMove=True)
-                if not self.isCheck(currentPlayer=False):
-                    validMoves.append(move)
-                self.undoMove(testMove=True)
-                # assert self.board == boardBefore
-        return validMoves
+        allyColor = 'w' if self.whiteToMove else 'b'
+        # check if the move starts at the specified square and if it is a piece of the player at turn
+        return self.filterValidMoves([move for move in self.possibleMoves
+                                      if move.fromSq == fromSq and move.pieceMoved[0] == allyColor])
 
     def updateValidMoves(self):
         """
-        Calls calculateValidMoves on all the squares and stores the result.
+        Determines the valid moves of the current player and stores the result. The possible moves are filtered if
+        they are already calculated, else only the possible moves of the current player are calculated.
+        With a MoveCache the moves are taken from it if the position has been seen before.
         """
-        validMoves = []
-        for col in range(8):
-            for row in range(8):
-                validMoves += self.calculateValidMoves((col, row))
-        self.validMoves = validMoves
+        cache = self.moveCache
+        if cache is not None:
+            packedMoves = cache.get(self.hash)
+            if packedMoves is not None:
+                self.validMoves = [Move(SQUARES[packed & 63], SQUARES[packed >> 6 & 63], self,
+                                        packed >> 12 & EN_PASSANT, packed >> 12 & CASTLING) for packed in packedMoves]
+                return
+        allyColor = 'w' if self.whiteToMove else 'b'
+        if self._possibleMoves is not None:
+            moves = [move for move in self._possibleMoves if move.pieceMoved[0] == allyColor]
+        else:
+            moves = []
+            for index in iterateBits(self.colorBitboards[allyColor]):
+                moves += self.calculatePossibleMoves(SQUARES[index])
+        self.validMoves = self.filterValidMoves(moves)
+        if cache is not None:
+            cache.put(self.hash, array('H', [move.fromIndex | move.toIndex << 6 | move.flags << 12
+                                             for move in self._validMoves]))
+
+    def generateValidMoves(self):
+        """
+        Yields the valid moves of the current player one at a time, calculating them piece by piece, so that callers
+        that only need some of them can stop early. Uses the cached valid moves if there are any.
+        """
+        if self._validMoves is not None:
+            yield from self._validMoves
+            return
+        allyColor = 'w' if self.whiteToMove else 'b'
+        restrictions = self.calculateMoveRestrictions()
+        for index in iterateBits(self.colorBitboards[allyColor]):
+            for move in self.calculatePossibleMoves(SQUARES[index]):
+                if self.isValidMove(move, restrictions):
+                    yield move
+
+    def calculateCaptureMoves(self):
+        """
+        Determines the valid captures and promotions of the current player, without generating the quiet moves.
+        Used by the quiescence search, which only looks at these moves at the leaves of the search tree.
+        :return: a list of ChessEngine.Move objects
+        :rtype: list
+        """
+        if self._validMoves is not None:
+            return [move for move in self._validMoves if move.isCapture() or move.isPromotion()]
+        allyColor = 'w' if self.whiteToMove else 'b'
+        squares = self.squares
+        moves = []
+        for index in iterateBits(self.colorBitboards[allyColor]):
+            pieceMoved = squares[index]
+            fromSq = SQUARES[index]
+            if pieceMoved[1] == 'p':
+                # a pawn on the row before the last one is promoted when it moves forward
+                if index // 8 == (1 if allyColor == 'w' else 6):
+                    toIndex = index - 8 if allyColor == 'w' else index + 8
+                    if squares[toIndex] == "--":
+                        moves.append(Move(fromSq, SQUARES[toIndex], self))
+                for toIndex in PAWN_TARGETS[allyColor][index]:
+                    if squares[toIndex][0] not in (allyColor, '-'):
+                        moves.append(Move(fromSq, SQUARES[toIndex], self))
+                    elif squares[toIndex] == "--" and SQUARES[toIndex] == tuple(self.enPassantSquare or ()):
+                        moves.append(Move(fromSq, SQUARES[toIndex], self, enPassant=True))
+            elif pieceMoved[1] in "NK":
+                for toIndex in (KNIGHT_TARGETS if pieceMoved[1] == 'N' else KING_TARGETS)[index]:
+                    if squares[toIndex][0] not in (allyColor, '-'):
+                        moves.append(Move(fromSq, SQUARES[toIndex], self))
+            else:
+                # only the first piece on each ray can be captured
+                for ray in SLIDER_RAY_SQUARES[pieceMoved[1]][index]:
+                    for toIndex in ray:
+                        if squares[toIndex] != "--":
+                            if squares[toIndex][0] != allyColor:
+                                moves.append(Move(fromSq, SQUARES[toIndex], self))
+                            break
+        return self.filterValidMoves(moves)
+
+    def hasValidMove(self):
+        """
+        :return: True if the current player has any valid move, else False
+        :rtype: bool
+        """
+        return next(self.generateValidMoves(), None) is not None
+
+    def filterValidMoves(self, moves):
+        """
+        Filters possible moves of the current player for the valid ones, see calculateMoveRestrictions.
+        :param moves: possible moves of the current player
+        :type moves: list
+        :return: the valid moves among them
+        :rtype: list
+        """
+        restrictions = self.calculateMoveRestrictions()
+        return [move for move in moves if self.isValidMove(move, restrictions)]
+
+    def calculateMoveRestrictions(self):
+        """
+        Determines the pieces checking the king of the current player, the pinned pieces and the squares the king may
+        not step on once for the position, so that each possible move can be validated with a few bit operations by
+        isValidMove.
+        :return: a tuple (kingDanger, evasions, pins) of the squares attacked by the opponent, the squares a piece
+        other than the king has to move to in order to resolve a check and the pins from calculatePins.
+        None if the current player has no or several kings, which can only happen on custom boards.
+        :rtype: tuple
+        """
+        allyColor, oppoColor = ('w', 'b') if self.whiteToMove else ('b', 'w')
+        kings = self.bitboards[allyColor + 'K']
+        if not kings or kings & (kings - 1):
+            return None
+        kingIndex = kings.bit_length() - 1
+        occupied = self.colorBitboards["w"] | self.colorBitboards["b"]
+        # the king may not step on attacked squares, also not on those behind it on the line of a checking slider
+        kingDanger = self.attackedSquares(oppoColor, occupied ^ kings)
+        checkers = self.attackersTo(kingIndex, oppoColor, occupied)
+        if not checkers:
+            evasions = ALL_SQUARES
+        elif checkers & (checkers - 1):
+            evasions = 0  # double check, only the king can move
+        else:
+            # capture the checking piece or block its line to the king
+            evasions = checkers | squaresBetween(kingIndex, checkers.bit_length() - 1)
+        return kingDanger, evasions, self.calculatePins(kingIndex, allyColor, occupied)
+
+    def isValidMove(self, move, restrictions):
+        """
+        :param move: a possible move of the current player
+        :param restrictions: the result of calculateMoveRestrictions for the current position
+        :return: True if the move doesn't put or leave the king of the current player in check
+        :rtype: bool
+        """
+        if restrictions is None:
+            return not self.leavesKingInCheck(move)
+        kingDanger, evasions, pins = restrictions
+        toBit = 1 << move.toIndex
+        if move.pieceMoved[1] == 'K':
+            # castling moves are only generated if none of the fields from rook to king are under attack
+            return move.castling or not toBit & kingDanger
+        if move.enPassant:
+            # en passant removes two pieces from the row of the capturing pawn, so it is tried out on the occupancy
+            return not self.leavesKingInCheck(move)
+        return toBit & evasions & pins.get(move.fromIndex, ALL_SQUARES) != 0
 
     def getValidMoves(self, fromSq):
         """
@@ -294,22 +806,30 @@ class GameState:
         """
         Executes a move and logs it, and changes which player's turn it is.
         Keeps track the enPassantSquare variable.
-        Calls updatePossibleMoves
+        The possible and valid moves of the new position are only calculated when they are accessed.
         :param move: a Move object that should be executed
         :type : ChessEngine.Move
         :return:
         :rtype:
         """
+        if not testMove and len(self.moveLog) % CHECKPOINT_INTERVAL == 0:
+            self.checkpoints[len(self.moveLog) // CHECKPOINT_INTERVAL:] = [tuple(self.squares)]
+        # remember what can't be derived from the move itself, so that undoMove can restore it without recalculating
+        self.pushUndoEntry(self.piecesMoved.copy())
+        if move.pieceMoved[1] == 'p' or move.pieceCaptured != "--":
+            self.halfmoveClock = 0  # the positions before can't occur again
+        else:
+            self.halfmoveClock += 1
         self.setPieceAt(move.toCol, move.toRow, move.pieceMoved)
         self.setPieceAt(move.fromCol, move.fromRow, "--")
         self.moveLog.append(move)
         if not testMove:
             self.handlePawnPromotion()
             # taking care of en passant
-            self.enPassantSquare = None
+            self.setEnPassantSquare(None)
             if move.pawnMadeTwoSteps():  # the move before an en passant capture
                 omittedRow = (move.fromRow + move.toRow) // 2
-                self.enPassantSquare = (move.fromCol, omittedRow)
+                self.setEnPassantSquare((move.fromCol, omittedRow))
             elif move.enPassant:  # the en passant capture itself
                 if move.pieceMoved[0] == 'w':
                     squareCapturedByEnpassant = move.toCol, move.toRow + 1
@@ -320,23 +840,26 @@ class GameState:
             # taking care of castling
             self.handleCastling(move)
         self.whiteToMove = not self.whiteToMove
-        # updatePossibleMoves needs to be called before updateValidMoves, but after handlePawnPromotion.
-        self.updatePossibleMoves()
-        if not testMove:
-            self.updateValidMoves()
+        self.hash ^= ZOBRIST_BLACK_TO_MOVE
+        # the moves of the new position are calculated when they are needed
+        self.possibleMoves = None
+        self.validMoves = None
 
     def undoMove(self, testMove=False):
         """
-        undoes the last move and deletes it from the log, thus allowing to undo all the moves
+        undoes the last move and deletes it from the log, thus allowing to undo all the moves.
+        The e.p. square, the moved pieces, the hash and the possible and valid moves are restored from the undo stack,
+        so nothing needs to be recalculated.
         """
         if len(self.moveLog) == 0:
             return
         move = self.moveLog.pop()
-        self.setPieceAt(move.fromCol, move.fromRow, move.pieceMoved)
-        self.setPieceAt(move.toCol, move.toRow, move.pieceCaptured)
-        if not testMove:
+        enPassantSquare, piecesMoved, positionHash, possibleMoves, validMoves, halfmoveClock = self.undoStack.pop()
+        if move is not None:  # None is a null move, which doesn't change the board
+            self.setPieceAt(move.fromCol, move.fromRow, move.pieceMoved)
+            self.setPieceAt(move.toCol, move.toRow, move.pieceCaptured)
+        if move is not None and not testMove:
             # taking care of en passant
-            self.enPassantSquare = move.enPassantSquare
             if move.enPassant:
                 if move.pieceMoved[0] == 'w':
                     pieceCapturedByEnpassant = move.toCol, move.toRow + 1
@@ -346,24 +869,53 @@ class GameState:
                     self.setPieceAt(pieceCapturedByEnpassant[0], pieceCapturedByEnpassant[1], "wp")
             # taking care of castling
             self.handleCastling(move, undo=True)
+        self.enPassantSquare = enPassantSquare
+        self.piecesMoved = piecesMoved
+        self.hash = positionHash
+        self.halfmoveClock = halfmoveClock
         self.whiteToMove = not self.whiteToMove
-        self.updatePossibleMoves()
-        if not testMove:
-            self.updateValidMoves()
+        self.possibleMoves = possibleMoves
+        self.validMoves = validMoves
+
+    def makeNullMove(self):
+        """
+        Passes the turn to the other player without moving a piece, as the null-move pruning of the search does.
+        An e.p. capture is not possible afterwards, and the positions before don't count as repetitions. The null move
+        is logged as None and taken back by undoNullMove or undoMove, it must be taken back before any method that
+        reads the move log is used.
+        """
+        self.pushUndoEntry(self.piecesMoved.copy())
+        self.halfmoveClock = 0
+        self.moveLog.append(None)
+        self.setEnPassantSquare(None)
+        self.whiteToMove = not self.whiteToMove
+        self.hash ^= ZOBRIST_BLACK_TO_MOVE
+        self.possibleMoves = None
+        self.validMoves = None
+
+    def pushUndoEntry(self, piecesMoved):
+        """
+        Saves the state before a move on the undo stack. The move lists are only kept for the last UNDO_CACHE_PLIES
+        moves, where the search takes moves back, so that a long game doesn't keep the move lists of all its
+        positions. They are calculated again when an older move is undone.
+        """
+        undoStack = self.undoStack
+        undoStack.append((self.enPassantSquare, piecesMoved, self.hash, self._possibleMoves, self._validMoves,
+                          self.halfmoveClock))
+        if len(undoStack) > UNDO_CACHE_PLIES:
+            (enPassantSquare, piecesMoved, positionHash, possibleMoves, validMoves,
+             halfmoveClock) = undoStack[-UNDO_CACHE_PLIES - 1]
+            if possibleMoves is not None or validMoves is not None:
+                undoStack[-UNDO_CACHE_PLIES - 1] = (enPassantSquare, piecesMoved, positionHash, None, None,
+                                                    halfmoveClock)
+
+    def undoNullMove(self):
+        if self.moveLog and self.moveLog[-1] is None:
+            self.undoMove()
 
     def handleFirstMoveWithRooksOrKing(self, move, undo=False):
-        if move.isFirstMoveWithBlackLeftRook:
-            self.piecesMoved["bLR"] = not undo
-        if move.isFirstMoveWithBlackRightRook:
-            self.piecesMoved["bRR"] = not undo
-        if move.isFirstMoveWithBlackKing:
-            self.piecesMoved["bK"] = not undo
-        if move.isFirstMoveWithWhiteLeftRook:
-            self.piecesMoved["wLR"] = not undo
-        if move.isFirstMoveWithWhiteRightRook:
-            self.piecesMoved["wRR"] = not undo
-        if move.isFirstMoveWithWhiteKing:
-            self.piecesMoved["wK"] = not undo
+        if move.firstMoveOf is not None:
+            self.setPieceMoved(move.firstMoveOf, not undo)
 
     def handleCastling(self, move, undo=False):
         self.handleFirstMoveWithRooksOrKing(move, undo=undo)
@@ -372,47 +924,46 @@ class GameState:
                 if move.toSq == (2, 7):  # wK with wLR
                     self.setPieceAt(0, 7, "--")
                     self.setPieceAt(3, 7, "wR")
-                    self.piecesMoved["wLR"] = True
+                    self.setPieceMoved("wLR", True)
                 elif move.toSq == (6, 7):  # wK with wRR
                     self.setPieceAt(7, 7, "--")
                     self.setPieceAt(5, 7, "wR")
-                    self.piecesMoved["wRR"] = True
+                    self.setPieceMoved("wRR", True)
                 elif move.toSq == (2, 0):  # bK with bLR
                     self.setPieceAt(0, 0, "--")
                     self.setPieceAt(3, 0, "bR")
-                    self.piecesMoved["bLR"] = True
+                    self.setPieceMoved("bLR", True)
                 elif move.toSq == (6, 0):  # bK with bRR
                     self.setPieceAt(7, 0, "--")
                     self.setPieceAt(5, 0, "bR")
-                    self.piecesMoved["bRR"] = True
+                    self.setPieceMoved("bRR", True)
             else:
                 if move.toSq == (2, 7):  # wK with wLR
                     self.setPieceAt(0, 7, "wR")
                     self.setPieceAt(3, 7, "--")
-                    self.piecesMoved["wLR"] = False
-                    self.piecesMoved["wK"] = False
+                    self.setPieceMoved("wLR", False)
+                    self.setPieceMoved("wK", False)
                 elif move.toSq == (6, 7):  # wK with wRR
                     self.setPieceAt(7, 7, "wR")
                     self.setPieceAt(5, 7, "--")
-                    self.piecesMoved["wRR"] = False
-                    self.piecesMoved["wK"] = False
+                    self.setPieceMoved("wRR", False)
+                    self.setPieceMoved("wK", False)
                 elif move.toSq == (2, 0):  # bK with bLR
                     self.setPieceAt(0, 0, "bR")
                     self.setPieceAt(3, 0, "--")
-                    self.piecesMoved["bLR"] = False
-                    self.piecesMoved["bK"] = False
+                    self.setPieceMoved("bLR", False)
+                    self.setPieceMoved("bK", False)
                 elif move.toSq == (6, 0):  # bK with bRR
                     self.setPieceAt(7, 0, "bR")
                     self.setPieceAt(5, 0, "--")
-                    self.piecesMoved["bRR"] = False
-                    self.piecesMoved["bK"] = False
+                    self.setPieceMoved("bRR", False)
+                    self.setPieceMoved("bK", False)
 
     def handlePawnPromotion(self):
-        for c in range(8):
-            if self.getPieceAt(c, 0) == "wp":
-                self.setPieceAt(c, 0, "wQ")
-            if self.getPieceAt(c, 7) == "bp":
-                self.setPieceAt(c, 7, "bQ")
+        for index in iterateBits(self.bitboards["wp"] & FIRST_ROW):
+            self.setPieceAt(index % 8, 0, "wQ")
+        for index in iterateBits(self.bitboards["bp"] & LAST_ROW):
+            self.setPieceAt(index % 8, 7, "bQ")
 
     def getAttackingMoves(self, pieceType=None, currentPlayer=None, square=None):
         """
@@ -438,70 +989,501 @@ class GameState:
         return checking_moves
 
     def isUnderAttack(self, square, currentPlayer=False):
-        return len(self.getAttackingMoves(square=square, currentPlayer=currentPlayer)) != 0
+        """
+        :param currentPlayer: if True, look for attacks by the current player, else by the other player
+        :return: True if the square is attacked by a piece of the given player
+        :rtype: bool
+        """
+        return self.isSquareAttacked(square, 'w' if self.whiteToMove == currentPlayer else 'b')
+
+    def attackersTo(self, index, color, occupied):
+        """
+        :param index: the bit index of the attacked square
+        :param color: the color of the attacking pieces, 'w' or 'b'
+        :param occupied: a bitboard of the occupied squares, the sliding pieces are blocked by
+        :return: a bitboard of the pieces of the given color attacking the given square
+        :rtype: int
+        """
+        pawn, knight, bishop, rook, queen, king = COLOR_PIECES[color]
+        bitboards = self.bitboards
+        return (PAWN_ATTACKS[OPPONENT[color]][index] & bitboards[pawn]
+                | KNIGHT_ATTACKS[index] & bitboards[knight]
+                | KING_ATTACKS[index] & bitboards[king]
+                | bishopAttacks(index, occupied) & (bitboards[bishop] | bitboards[queen])
+                | rookAttacks(index, occupied) & (bitboards[rook] | bitboards[queen]))
+
+    def staticExchangeEvaluation(self, move):
+        """
+        Resolves the exchange of pieces on the target square of a capture without making any moves: after the move
+        both players recapture with their least valuable attacker, and each may stop when going on would lose
+        material. Sliders behind a capturing piece join the exchange once the piece has left its square. Pins are not
+        taken into account, and the king only recaptures if the square isn't attacked anymore.
+        :param move: a capture or promotion of the current player
+        :return: the material the current player wins by the move in centipawns, negative if the move loses material
+        :rtype: int
+        """
+        toIndex = move.toIndex
+        occupied = (self.colorBitboards["w"] | self.colorBitboards["b"]) ^ (1 << move.fromIndex)
+        if move.enPassant:
+            capturedIndex = toIndex + 8 if move.pieceMoved[0] == 'w' else toIndex - 8
+            occupied ^= 1 << capturedIndex
+            gains = [PIECE_VALUES['p']]
+        else:
+            gains = [PIECE_VALUES[move.pieceCaptured[1]] if move.pieceCaptured != "--" else 0]
+        pieceValue = PIECE_VALUES[move.pieceMoved[1]]
+        if move.isPromotion():
+            gains[0] += PIECE_VALUES['Q'] - PIECE_VALUES['p']
+            pieceValue = PIECE_VALUES['Q']
+        color = OPPONENT[move.pieceMoved[0]]
+        while True:
+            attackers = self.attackersTo(toIndex, color, occupied) & occupied
+            if not attackers:
+                break
+            # the least valuable attacker captures
+            for piece in COLOR_PIECES[color]:
+                pieceAttackers = attackers & self.bitboards[piece]
+                if pieceAttackers:
+                    break
+            attackerBit = pieceAttackers & -pieceAttackers
+            if piece[1] == 'K' and self.attackersTo(toIndex, OPPONENT[color], occupied ^ attackerBit) & occupied:
+                break
+            # the gain of capturing, from the point of view of the capturing player
+            gains.append(pieceValue - gains[-1])
+            pieceValue = PIECE_VALUES[piece[1]]
+            occupied ^= attackerBit
+            color = OPPONENT[color]
+        # going backwards through the exchange, each player only captures if it doesn't lose material
+        for index in range(len(gains) - 1, 0, -1):
+            gains[index - 1] = -max(-gains[index - 1], gains[index])
+        return gains[0]
+
+    def attackedSquares(self, color, occupied):
+        """
+        :param color: the color of the attacking pieces, 'w' or 'b'
+        :param occupied: a bitboard of the occupied squares, the sliding pieces are blocked by
+        :return: a bitboard of all the squares attacked by the pieces of the given color
+        :rtype: int
+        """
+        pawn, knight, bishop, rook, queen, king = COLOR_PIECES[color]
+        bitboards = self.bitboards
+        attacked = 0
+        for index in iterateBits(bitboards[pawn]):
+            attacked |= PAWN_ATTACKS[color][index]
+        for index in iterateBits(bitboards[knight]):
+            attacked |= KNIGHT_ATTACKS[index]
+        for index in iterateBits(bitboards[bishop] | bitboards[queen]):
+            attacked |= bishopAttacks(index, occupied)
+        for index in iterateBits(bitboards[rook] | bitboards[queen]):
+            attacked |= rookAttacks(index, occupied)
+        for index in iterateBits(bitboards[king]):
+            attacked |= KING_ATTACKS[index]
+        return attacked
+
+    def calculatePins(self, kingIndex, color, occupied):
+        """
+        Finds the pieces of the given color that are pinned to their king by an opponent's slider.
+        :return: a dict mapping the bit index of each pinned piece to a bitboard of the squares it may still move to,
+        which are the squares between the king and the pinning piece, including the pinning piece
+        :rtype: dict
+        """
+        pins = {}
+        allies = self.colorBitboards[color]
+        pawn, knight, bishop, rook, queen, king = COLOR_PIECES[OPPONENT[color]]
+        bitboards = self.bitboards
+        for rays, sliders in ((ROOK_RAYS, bitboards[rook] | bitboards[queen]),
+                              (BISHOP_RAYS, bitboards[bishop] | bitboards[queen])):
+            if not sliders:
+                continue
+            for ray, positive in rays:
+                blockers = ray[kingIndex] & occupied
+                if not blockers:
+                    continue
+                # the first piece on the ray must be an ally and the second one a slider of the opponent
+                first = closestBit(blockers, positive)
+                if not allies >> first & 1:
+                    continue
+                blockers ^= 1 << first
+                if blockers and sliders >> closestBit(blockers, positive) & 1:
+                    pins[first] = ray[kingIndex] ^ ray[closestBit(blockers, positive)]
+        return pins
+
+    def isSquareAttacked(self, square, color):
+        """
+        :return: True if any piece of the given color attacks the given square, else False
+        :rtype: bool
+        """
+        return self.isAttackedBy(squareToIndex(square), color)
+
+    def isAttackedBy(self, index, color):
+        """
+        Looks up if the square with the given bit index is attacked by a piece of the given color by scanning from the
+        square outwards: the squares a knight, pawn or king would attack it from and the first piece on each ray.
+        :rtype: bool
+        """
+        pawn, knight, bishop, rook, queen, king = COLOR_PIECES[color]
+        squares = self.squares
+        for fromIndex in KNIGHT_TARGETS[index]:
+            if squares[fromIndex] == knight:
+                return True
+        for ray in ROOK_RAY_SQUARES[index]:
+            for fromIndex in ray:
+                piece = squares[fromIndex]
+                if piece != "--":
+                    if piece == rook or piece == queen:
+                        return True
+                    break
+        for ray in BISHOP_RAY_SQUARES[index]:
+            for fromIndex in ray:
+                piece = squares[fromIndex]
+                if piece != "--":
+                    if piece == bishop or piece == queen:
+                        return True
+                    break
+        # a pawn attacks the square from where a pawn of the other color on it would attack
+        for fromIndex in PAWN_TARGETS[OPPONENT[color]][index]:
+            if squares[fromIndex] == pawn:
+                return True
+        for fromIndex in KING_TARGETS[index]:
+            if squares[fromIndex] == king:
+                return True
+        return False
+
+    def isKingAttacked(self, color):
+        """
+        :return: True if a king of the given color is under attack by the other color, else False
+        :rtype: bool
+        """
+        return any(self.isAttackedBy(index, OPPONENT[color]) for index in iterateBits(self.bitboards[color + 'K']))
+
+    def leavesKingInCheck(self, move):
+        """
+        Determines if a possible move would put or leave the king of the moving player in check, by executing it on
+        a copy of the occupancy bitboard only.
+        :rtype: bool
+        """
+        color = move.pieceMoved[0]
+        fromBit = 1 << move.fromIndex
+        toBit = 1 << move.toIndex
+        kings = toBit if move.pieceMoved[1] == 'K' else self.bitboards[color + 'K']
+        occupied = (self.colorBitboards["w"] | self.colorBitboards["b"]) & ~fromBit | toBit
+        captured = toBit
+        if move.enPassant:
+            # the captured pawn stands next to the pawn that captures it
+            capturedPawnBit = 1 << (move.fromIndex - move.fromIndex % 8 + move.toIndex % 8)
+            occupied &= ~capturedPawnBit
+            captured |= capturedPawnBit
+        for index in iterateBits(kings):
+            if self.attackersTo(index, OPPONENT[color], occupied) & ~captured:
+                return True
+        return False
 
     def isCheck(self, currentPlayer=True):
         """
         :param currentPlayer: True by default, if set to False the function will look for check
         in the other player instead
-        :return: True if current player is checking the other player, else False.
+        :return: True if the king of the current player is under attack, else False.
         :rtype: bool
         """
-        return len(self.getAttackingMoves(currentPlayer=not currentPlayer, pieceType='K')) != 0
+        return self.isKingAttacked('w' if self.whiteToMove == currentPlayer else 'b')
 
     def isStalemate(self):
-        return len(self.validMoves) == 0 and not self.isCheck()
+        return not self.isCheck() and not self.hasValidMove()
 
     def isCheckmate(self):
-        return len(self.validMoves) == 0 and self.isCheck()
+        return self.isCheck() and not self.hasValidMove()
+
+    def isRepetition(self, times=1):
+        """
+        Checks if the position occurred before, by comparing the hashes of the positions on the undo stack and of
+        the previousHashes before it. Only the positions since the last capture or pawn move, with the same player at
+        turn, can be the same, so only every second of the last halfmoveClock positions is looked at.
+        :param times: how often the position must have occurred before, 1 is enough for the search, 2 makes a
+        threefold repetition
+        :rtype: bool
+        """
+        undoStack = self.undoStack
+        previousHashes = self.previousHashes
+        positionHash = self.hash
+        count = 0
+        # negative indices are the positions before the undo stack, counted from its start
+        for index in range(len(undoStack) - 2, max(len(undoStack) - self.halfmoveClock, -len(previousHashes)) - 1, -2):
+            if (undoStack[index][2] if index >= 0 else previousHashes[index]) == positionHash:
+                count += 1
+                if count >= times:
+                    return True
+        return False
+
+    def isThreefoldRepetition(self):
+        return self.isRepetition(2)
+
+    def isFiftyMoveRule(self):
+        """
+        :return: True if there was no capture and no pawn move in the last fifty moves of each player, unless the
+        last of them checkmated
+        :rtype: bool
+        """
+        return self.halfmoveClock >= FIFTY_MOVE_PLIES and not self.isCheckmate()
+
+    def isInsufficientMaterial(self):
+        """
+        Checks if neither player can checkmate: there are only the kings and at most one knight or bishop, or only
+        bishops that all stand on squares of the same color. Uses the incrementally kept bitboards and phase (the
+        number of knights and bishops, if there are no rooks and queens), so it takes constant time.
+        :rtype: bool
+        """
+        bitboards = self.bitboards
+        if (bitboards["wp"] | bitboards["bp"] | bitboards["wR"] | bitboards["bR"]
+                | bitboards["wQ"] | bitboards["bQ"]):
+            return False
+        if self.phase <= 1:
+            return True
+        if bitboards["wN"] | bitboards["bN"]:
+            return False
+        bishops = bitboards["wB"] | bitboards["bB"]
+        return not bishops & LIGHT_SQUARES or not bishops & DARK_SQUARES
+
+    def isDraw(self):
+        """
+        :return: True if the game is drawn by insufficient material, a threefold repetition, the fifty-move rule or
+        stalemate
+        :rtype: bool
+        """
+        return (self.isInsufficientMaterial() or self.isThreefoldRepetition() or self.isFiftyMoveRule()
+                or self.isStalemate())
+
+    def getBoardBeforeMove(self, moveIndex):
+        """
+        Reconstructs the board as it was before the move with the given index in the move log was executed, by
+        replaying the moves since the last checkpoint before it, so at most CHECKPOINT_INTERVAL - 1 moves.
+        :rtype: list
+        """
+        checkpoint = moveIndex // CHECKPOINT_INTERVAL
+        if checkpoint >= len(self.checkpoints):
+            # no checkpoint was saved for the moves, take them back from the current board
+            board = [row[:] for row in self.board]
+            for move in reversed(self.moveLog[moveIndex:]):
+                if move is not None:  # a null move doesn't change the board
+                    takeBackMove(board, move)
+            return board
+        squares = self.checkpoints[checkpoint]
+        board = [list(squares[row * 8:row * 8 + 8]) for row in range(8)]
+        for move in self.moveLog[checkpoint * CHECKPOINT_INTERVAL:moveIndex]:
+            replayMove(board, move)
+        return board
 
     def printMoveLog(self):
+        # replay the moves one by one from the first checkpoint to get the board before each of them
+        board = self.getBoardBeforeMove(0)
         for move in self.moveLog:
             formation = ""
-            for row in move.board:
+            for row in board:
                 for field in row:
                     formation += field + " "
                 formation += "\n"
             print(formation)
             print(move, "\n")
+            replayMove(board, move)
 
     def setBoard(self, board):
         self.board = board
-        self.updatePossibleMoves()
-        self.updateValidMoves()
+
+    def setFen(self, fen):
+        """
+        Sets up the position described by a string in Forsyth-Edwards Notation and clears the move log. The move
+        number is ignored.
+        :param fen: e.g. "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+        :type fen: str
+        """
+        fields = fen.split()
+        board = []
+        for rank in fields[0].split('/'):
+            row = []
+            for char in rank:
+                if char.isdigit():
+                    row += ["--"] * int(char)
+                else:
+                    row.append(('w' if char.isupper() else 'b') + ('p' if char in "pP" else char.upper()))
+            board.append(row)
+        castling = fields[2] if len(fields) > 2 else "-"
+        self.whiteToMove = len(fields) < 2 or fields[1] == 'w'
+        self.piecesMoved = {"wK": "K" not in castling and "Q" not in castling,
+                            "wLR": "Q" not in castling,
+                            "wRR": "K" not in castling,
+                            "bK": "k" not in castling and "q" not in castling,
+                            "bLR": "q" not in castling,
+                            "bRR": "k" not in castling}
+        self.enPassantSquare = None
+        if len(fields) > 3 and fields[3] != "-":
+            self.enPassantSquare = ("abcdefgh".index(fields[3][0]), 8 - int(fields[3][1]))
+        self.halfmoveClock = int(fields[4]) if len(fields) > 4 else 0
+        self.clearHistory()
+        self.setBoard(board)
+
+    def clone(self, keepHistory=False):
+        """
+        Copies the position without calling __init__ and without recalculating anything: the board, the bitboards,
+        the player at turn, the moved rooks and kings, the e.p. square, the halfmove clock, the hashes and the
+        evaluation terms. The cached move lists and the MoveCache are shared, as they are replaced but never changed.
+        An accumulator is not copied, attach a new one to the clone if needed.
+        :param keepHistory: if the move log and the undo stack should be copied too, so that the moves made before
+        can be undone on the clone. Without history the clone starts with an empty move log, but keeps the hashes of
+        the positions since the last capture or pawn move to detect repetitions.
+        :rtype: GameState
+        """
+        gs = GameState.__new__(GameState)
+        gs.whiteToMove = self.whiteToMove
+        gs.moveLog = self.moveLog[:] if keepHistory else []
+        # undoMove reinstates the dicts of the moved pieces from the undo stack, and they are changed in place later
+        gs.undoStack = [(enPassantSquare, piecesMoved.copy(), positionHash, possibleMoves, validMoves, halfmoveClock)
+                        for enPassantSquare, piecesMoved, positionHash, possibleMoves, validMoves, halfmoveClock
+                        in self.undoStack] if keepHistory else []
+        gs.halfmoveClock = self.halfmoveClock
+        if keepHistory:
+            gs.previousHashes = self.previousHashes[:]
+        else:
+            recentMoves = min(self.halfmoveClock, len(self.undoStack))
+            hashes = self.previousHashes + [entry[2] for entry in self.undoStack[len(self.undoStack) - recentMoves:]]
+            gs.previousHashes = hashes[max(len(hashes) - self.halfmoveClock, 0):]
+        gs.checkpoints = self.checkpoints[:] if keepHistory else []
+        gs.accumulator = None
+        gs.moveCache = self.moveCache
+        gs._possibleMoves = self._possibleMoves
+        gs._validMoves = self._validMoves
+        gs.enPassantSquare = self.enPassantSquare
+        gs.piecesMoved = self.piecesMoved.copy()
+        gs._board = [row[:] for row in self._board]
+        gs.squares = self.squares[:]
+        gs.bitboards = self.bitboards.copy()
+        gs.colorBitboards = self.colorBitboards.copy()
+        gs.hash = self.hash
+        gs.pawnHash = self.pawnHash
+        gs.middlegameScore = self.middlegameScore
+        gs.endgameScore = self.endgameScore
+        gs.phase = self.phase
+        return gs
+
+    def clearHistory(self):
+        """
+        Forgets the moves made so far, when a new position is set up: they can't be undone and their positions
+        don't count as repetitions.
+        """
+        self.moveLog = []
+        self.undoStack = []
+        self.checkpoints = []
+        self.previousHashes = []
 
     def setWhiteToMove(self, whiteToMove):
+        if self.whiteToMove != whiteToMove:
+            self.hash ^= ZOBRIST_BLACK_TO_MOVE
         self.whiteToMove = whiteToMove
-        self.updatePossibleMoves()
-        self.updateValidMoves()
+        self.possibleMoves = None
+        self.validMoves = None
+
+
+class MoveCache:
+    """
+    A cache of the valid moves of the positions seen, keyed by the hash of the position, which covers the pieces,
+    the player at turn, the moved rooks and kings and the e.p. square. Each move is packed into 16 bits, the from
+    and to bit indices and the flags, and rebuilt for the board when it is taken from the cache. When the cache is
+    full, the position used least recently is evicted.
+    Attach it to a GameState as its attribute moveCache, several GameStates may share one.
+    """
+
+    def __init__(self, capacity=4096):
+        """
+        :param capacity: the maximum number of positions in the cache
+        """
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, positionHash):
+        """
+        :return: the packed valid moves of the position, an array of 16 bit integers, or None if it isn't cached
+        :rtype: array
+        """
+        packedMoves = self.entries.get(positionHash)
+        if packedMoves is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(positionHash)
+        return packedMoves
+
+    def put(self, positionHash, packedMoves):
+        self.entries[positionHash] = packedMoves
+        self.entries.move_to_end(positionHash)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def hitRate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
 
 
 class Move:
     """
-    This Class should store all the information about a certain move. The attribute board is the state of the board
-    before the move is executed.
+    This Class should store all the information about a certain move. To keep the many moves generated per position
+    small, it only stores the bit indices of the two squares, the two pieces, the e.p. square before the move and a
+    few flags in slots. The squares, rows and columns are derived from the indices on demand. The board before the
+    move is not stored, it can be obtained from GameState.getBoardBeforeMove.
     """
 
+    __slots__ = ("fromIndex", "toIndex", "pieceMoved", "pieceCaptured", "enPassantSquare", "flags", "firstMoveOf")
+
     def __init__(self, fromSq, toSq, gameState, enPassant=False, castling=False):
-        self.fromSq = fromSq
-        self.fromCol = fromSq[0]
-        self.fromRow = fromSq[1]
-        self.toSq = toSq
-        self.toCol = toSq[0]
-        self.toRow = toSq[1]
-        self.pieceMoved = gameState.board[self.fromRow][self.fromCol]
-        # copy the gameState's boad by value - represents the board before the move was made
-        self.board = copy.deepcopy(gameState.board)
-        self.enPassant = enPassant
-        self.pieceCaptured = gameState.board[self.toRow][self.toCol]
+        self.fromIndex = fromSq[1] * 8 + fromSq[0]
+        self.toIndex = toSq[1] * 8 + toSq[0]
+        self.pieceMoved = gameState.squares[self.fromIndex]
+        self.pieceCaptured = gameState.squares[self.toIndex]
         self.enPassantSquare = gameState.enPassantSquare  # the e.p. square before the move was made
-        self.castling = castling
-        self.isFirstMoveWithBlackLeftRook = self.fromSq == (0, 0) and not gameState.piecesMoved["bLR"]
-        self.isFirstMoveWithBlackRightRook = self.fromSq == (7, 0) and not gameState.piecesMoved["bRR"]
-        self.isFirstMoveWithBlackKing = self.fromSq == (4, 0) and not gameState.piecesMoved["bK"]
-        self.isFirstMoveWithWhiteLeftRook = self.fromSq == (0, 7) and not gameState.piecesMoved["wLR"]
-        self.isFirstMoveWithWhiteRightRook = self.fromSq == (7, 7) and not gameState.piecesMoved["wRR"]
-        self.isFirstMoveWithWhiteKing = self.fromSq == (4, 7) and not gameState.piecesMoved["wK"]
+        self.flags = (EN_PASSANT if enPassant else 0) | (CASTLING if castling else 0)
+        # the key in GameState.piecesMoved of the rook or king that is moved for the first time by this move, if any
+        self.firstMoveOf = FIRST_MOVE_SQUARES.get(self.fromIndex)
+        if self.firstMoveOf is not None and gameState.piecesMoved[self.firstMoveOf]:
+            self.firstMoveOf = None
+
+    @property
+    def fromSq(self):
+        return SQUARES[self.fromIndex]
+
+    @property
+    def toSq(self):
+        return SQUARES[self.toIndex]
+
+    @property
+    def fromCol(self):
+        return self.fromIndex % 8
+
+    @property
+    def fromRow(self):
+        return self.fromIndex // 8
+
+    @property
+    def toCol(self):
+        return self.toIndex % 8
+
+    @property
+    def toRow(self):
+        return self.toIndex // 8
+
+    @property
+    def enPassant(self):
+        return self.flags & EN_PASSANT != 0
+
+    @property
+    def castling(self):
+        return self.flags & CASTLING != 0
 
     def __str__(self):
         """
@@ -525,13 +1507,23 @@ class Move:
 
     def __eq__(self, other):
         if isinstance(other, Move):
-            return self.fromSq == other.fromSq and self.toSq == other.toSq
+            return self.fromIndex == other.fromIndex and self.toIndex == other.toIndex
         elif isinstance(other, Iterable) and len(other) == 2:
             return self.fromSq == other[0] and self.toSq == other[1]
         return False
 
     def pawnMadeTwoSteps(self):
-        return self.pieceMoved[1] == "p" and abs(self.fromRow - self.toRow) == 2
+        return self.pieceMoved[1] == "p" and abs(self.fromIndex - self.toIndex) == 16
+
+    def isCapture(self):
+        return self.pieceCaptured != "--" or self.flags & EN_PASSANT != 0
+
+    def isPromotion(self):
+        """
+        :return: True if a pawn reaches the last row, where it is promoted to a queen
+        :rtype: bool
+        """
+        return self.pieceMoved[1] == "p" and (self.toIndex < 8 or self.toIndex >= 56)
 
     # def getCapturedSquare(self):
     #     if not self.enPassant:
@@ -540,7 +1532,61 @@ class Move:
     #         return self.toCol, self.toRow + (1 if self.pieceMoved[0] == 'w' else - 1)
 
 
+def takeBackMove(board, move):
+    """
+    Takes back a move on a board (a list of rows), which must be the board right after the move was executed.
+    """
+    board[move.fromRow][move.fromCol] = move.pieceMoved
+    board[move.toRow][move.toCol] = move.pieceCaptured
+    if move.enPassant:
+        # the captured pawn stood next to the pawn that captured it
+        board[move.fromRow][move.toCol] = 'bp' if move.pieceMoved[0] == 'w' else 'wp'
+    elif move.castling:
+        rookFrom, rookTo = CASTLING_ROOK_MOVES[move.toIndex]
+        board[rookFrom // 8][rookFrom % 8] = board[rookTo // 8][rookTo % 8]
+        board[rookTo // 8][rookTo % 8] = "--"
+
+
+def replayMove(board, move):
+    """
+    Executes a move on a board (a list of rows), which must be the board right before the move, the counterpart of
+    takeBackMove. A null move (None) leaves the board as it is.
+    """
+    if move is None:
+        return
+    piece = move.pieceMoved
+    if piece[1] == 'p' and move.toRow in (0, 7):
+        piece = piece[0] + 'Q'  # pawns are always promoted to a queen
+    board[move.toRow][move.toCol] = piece
+    board[move.fromRow][move.fromCol] = "--"
+    if move.enPassant:
+        board[move.fromRow][move.toCol] = "--"
+    elif move.castling:
+        rookFrom, rookTo = CASTLING_ROOK_MOVES[move.toIndex]
+        board[rookTo // 8][rookTo % 8] = board[rookFrom // 8][rookFrom % 8]
+        board[rookFrom // 8][rookFrom % 8] = "--"
+
+
 def indexToChessNotation(square):
     files = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h']
     ranks = range(8, 0, -1)
     return files[square[0]] + str(ranks[square[1]])
+
+
+def moveToCoordinates(move):
+    """
+    :return: the move in coordinate notation, e.g. "e2e4"
+    :rtype: str
+    """
+    return indexToChessNotation(move.fromSq) + indexToChessNotation(move.toSq)
+
+
+def gameStateFromFen(fen):
+    """
+    :param fen: a position in Forsyth-Edwards Notation, see GameState.setFen
+    :return: a new GameState set up with the position
+    :rtype: GameState
+    """
+    gs = GameState()
+    gs.setFen(fen)
+    return gs
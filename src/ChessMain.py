@@ -25,10 +25,11 @@ CONTROL_PANE_WIDTH = 200
 CHECK_TEXT = "Check!"
 CHECKMATE_TEXT = "Checkmate!"
 STALEMATE_TEXT = "Stalemate!"
+DRAW_TEXT = "Draw!"
 FONT = None
 FONT_COLOR = "firebrick"
 LABEL_Y_POS = 80
-CHECK = CHECKMATE = STALEMATE = False
+CHECK = CHECKMATE = STALEMATE = DRAW = False
 checkBoxPos = (WIDTH + CONTROL_PANE_WIDTH // 20, 400)
 MAX_FPS = 40
 
@@ -67,6 +68,8 @@ def main():
     clock = p.time.Clock()
     screen.fill(p.Color(chessGUI.backGroundColor))
     gs = ChessEngine.GameState()
+    # takebacks and repeated positions don't calculate their moves again
+    gs.moveCache = ChessEngine.MoveCache()
     running = True
     playerClicks = []  # two  tuples: [(6, 4), (4, 4)]
     initializeControlWidgets()
@@ -210,8 +213,8 @@ def displayChessClock(screen, chessClock, whiteToMove):
 
 
 def handleIfCheck(gs, chessGUI):
-    global chess_clock_running, CHECKMATE, STALEMATE, CHECK
-    CHECKMATE = CHECK = STALEMATE = False
+    global chess_clock_running, CHECKMATE, STALEMATE, DRAW, CHECK
+    CHECKMATE = CHECK = STALEMATE = DRAW = False
     p1CheckingMoves = gs.getAttackingMoves(currentPlayer=False, pieceType='K')  # the moves of enemy that check current player
     if len(p1CheckingMoves) != 0:  # check or checkmate
         # highlight all the player2 kings that are under attack
@@ -220,12 +223,19 @@ def handleIfCheck(gs, chessGUI):
             chess_clock_running = False
             CHECKMATE = True
             return
+        elif gs.isDraw():
+            chess_clock_running = False
+            DRAW = True
+            return
         else:
             CHECK = True
             return
     elif gs.isStalemate():
         chess_clock_running = False
         STALEMATE = True
+    elif gs.isDraw():
+        chess_clock_running = False
+        DRAW = True
 
 
 def blitCurrentCheckLabels():
@@ -235,6 +245,8 @@ def blitCurrentCheckLabels():
         blitCheckmateLabel()
     elif STALEMATE:
         blitStalemateLabel()
+    elif DRAW:
+        blitDrawLabel()
 
 
 def blitCheckLabel():
@@ -276,6 +288,19 @@ def blitStalemateLabel():
     screen.blit(label, (x_center, y_center))
 
 
+def blitDrawLabel():
+    x = (WIDTH + CONTROL_PANE_WIDTH // 2)
+    y = LABEL_Y_POS
+    h = FONT.size(DRAW_TEXT)[1]
+    w = FONT.size(DRAW_TEXT)[0]
+    screen = p.display.get_surface()
+    x_center = x - w // 2
+    y_center = y - h // 2
+    color = p.Color(FONT_COLOR)
+    label = FONT.render(DRAW_TEXT, True, color)
+    screen.blit(label, (x_center, y_center))
+
+
 def saveGame(gs, chessClock):
     Tk().withdraw()
     filepath = asksaveasfilename(initialdir=os.getcwd(), title = "Select file", initialfile="gameState.json", filetypes=[("JSON Files", "*.json")])
@@ -286,6 +311,7 @@ def saveGame(gs, chessClock):
         "whiteToMove": gs.whiteToMove,
         "enPassantSquare": gs.enPassantSquare,
         "piecesMoved": gs.piecesMoved,
+        "halfmoveClock": gs.halfmoveClock,
         "chessClockTime": chessClock.currentTime
     }
     with open(filepath, 'w') as file:
@@ -305,13 +331,17 @@ def loadGame(gs, chessClock):
             messagebox.showinfo("Bad File", "Could not load game from this file. File seems empty or formatted wrong")
             return
     try:
-        gs.board = jsonData["board"]
         gs.whiteToMove = jsonData["whiteToMove"]
-        gs.enPassantSquare = jsonData["enPassantSquare"]
+        # json stores the tuple as a list
+        gs.enPassantSquare = tuple(jsonData["enPassantSquare"]) if jsonData["enPassantSquare"] else None
         gs.piecesMoved = jsonData["piecesMoved"]
+        # files saved before the halfmove clock was kept don't have it
+        gs.halfmoveClock = jsonData.get("halfmoveClock", 0)
+        # the moves of the previous game can't be undone or repeated in the loaded one
+        gs.clearHistory()
         chessClock.reset(jsonData["chessClockTime"])
-        gs.updatePossibleMoves()
-        gs.updateValidMoves()
+        # setting the board last recalculates the hash and the moves for the loaded position
+        gs.setBoard(jsonData["board"])
     except KeyError:
         messagebox.showinfo("Bad File", "Could not load game from this file. The file does not contain all the "
                                         "necessary information")
@@ -0,0 +1,462 @@
+"""
+Computer opponent: a negamax alpha-beta search with iterative deepening over a GameState.
+The search makes and undoes the moves on the given GameState itself, so no positions are copied, and the valid
+moves of a position are only generated when the position is searched.
+Run it from the repository root to let it analyse a position, e.g.
+    python -m src.ChessSearch --fen "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3" --time 5
+or to compare the number of nodes searched with each of the selective search techniques turned off
+    python -m src.ChessSearch --benchmark --depth 5
+"""
+import argparse
+import sys
+import time
+
+from .ChessEngine import GameState, PIECE_VALUES, FIFTY_MOVE_PLIES, START_FEN, moveToCoordinates
+from .MoveOrdering import MoveOrderer, mvvLva
+from .PawnEvaluation import PawnHashTable
+from .TranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, unpackMove
+
+MATE_SCORE = 100000  # the score of being checkmated right now, mates further away score closer to 0
+MATE_THRESHOLD = MATE_SCORE - 1000  # scores beyond this are mate scores
+INFINITY = MATE_SCORE + 1
+MAX_DEPTH = 64
+# a capture is not searched in the quiescence search if even winning the captured piece plus this margin can't raise
+# the score to alpha
+DELTA_MARGIN = 200
+# the budget is checked every that many nodes
+CHECK_INTERVAL = 1024
+
+
+def evaluate(gs, pawnTable=None):
+    """
+    :param pawnTable: the PawnHashTable to take the pawn structure score from, None to leave the pawn structure out
+    :return: the score of the position from the point of view of the player to move, see GameState.evaluate
+    :rtype: int
+    """
+    if pawnTable is None:
+        return gs.evaluate()
+    return gs.evaluate() + pawnTable.evaluate(gs)
+
+
+def scoreToTable(score, ply):
+    """
+    Mate scores are stored in the transposition table relative to the position instead of the root.
+    """
+    if score > MATE_THRESHOLD:
+        return score + ply
+    if score < -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def scoreFromTable(score, ply):
+    if score > MATE_THRESHOLD:
+        return score - ply
+    if score < -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+# the positions of the node count benchmark, see benchmark
+BENCHMARK_POSITIONS = (
+    START_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+)
+
+
+class SearchConfig:
+    """
+    Switches and parameters of the selective search techniques, all of them are on by default.
+    """
+
+    def __init__(self, principalVariationSearch=True, nullMovePruning=True, lateMoveReductions=True,
+                 aspirationWindows=True):
+        """
+        :param principalVariationSearch: if the moves after the first one should be searched with a null window
+        first, and only be searched again with the full window if they turn out better
+        :param nullMovePruning: if a position should be cut off when passing the turn and searching with reduced depth
+        still fails high
+        :param lateMoveReductions: if quiet moves late in the move order should be searched with reduced depth first
+        :param aspirationWindows: if the iterations should search a window around the score of the last iteration
+        first
+        """
+        self.principalVariationSearch = principalVariationSearch
+        self.nullMovePruning = nullMovePruning
+        self.lateMoveReductions = lateMoveReductions
+        self.aspirationWindows = aspirationWindows
+        self.nullMoveReduction = 2  # the depth is reduced by this much in addition to the null move itself
+        self.nullMoveMinDepth = 3
+        self.lateMoveMinDepth = 3
+        self.lateMoveMinNumber = 3  # the number of moves searched at full depth before the reductions start
+        self.aspirationWindow = 50  # half the width of the first window in centipawns
+        self.aspirationMinDepth = 4
+
+    def __str__(self):
+        enabled = [name for name in ("principalVariationSearch", "nullMovePruning", "lateMoveReductions",
+                                     "aspirationWindows") if getattr(self, name)]
+        return ", ".join(enabled) if enabled else "plain alpha-beta"
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the node or time budget is used up.
+    """
+
+
+class Search:
+    """
+    Negamax alpha-beta search. Every iteration of the iterative deepening searches one ply deeper than the last,
+    the transposition table keeps the best moves of the former iterations so that they are searched first.
+    The statistics of the last search are kept in nodes, depth and elapsed, and interrupted tells if the budget ran
+    out or the stopCondition stopped it before the last iteration was completed.
+    """
+
+    def __init__(self, transpositionTable=None, evaluate=None, moveOrdering=True, quiescence=True, config=None):
+        """
+        :param transpositionTable: the table to use, a new one of the default size if None
+        :param evaluate: the function scoring a GameState from the point of view of the player to move, if None the
+        module function evaluate with the pawn hash table of the search, see evaluatePosition
+        :param moveOrdering: if the moves should be ordered by the MoveOrderer, else only the transposition table move
+        is searched first
+        :param quiescence: if the captures and promotions at the leaves should be searched by quiescence
+        :param config: the SearchConfig of the selective search techniques, the default one if None
+        """
+        self.tt = transpositionTable if transpositionTable is not None else TranspositionTable()
+        self.pawnTable = PawnHashTable()
+        self.evaluate = evaluate if evaluate is not None else self.evaluatePosition
+        self.orderer = MoveOrderer() if moveOrdering else None
+        self.quiescence = quiescence
+        self.config = config if config is not None else SearchConfig()
+        self.nodes = 0
+        self.depth = 0
+        self.elapsed = 0.0
+        self.interrupted = False
+        self.maxNodes = None
+        self.deadline = None
+        self.nextCheck = CHECK_INTERVAL
+        # an optional function checked with the budget, the search stops when it returns True
+        self.stopCondition = None
+        # the principal variation found at each ply, see negamax
+        self.pvTable = [[] for ply in range(MAX_DEPTH + 1)]
+
+    def search(self, gs, maxDepth=MAX_DEPTH, maxNodes=None, maxTime=None, info=None, startDepth=1):
+        """
+        Searches the position of the GameState with iterative deepening until the depth, node or time budget is used
+        up. An interrupted iteration is thrown away, the result is the one of the last complete iteration.
+        :param maxDepth: the depth of the last iteration
+        :param maxNodes: the number of nodes after which the search stops, None for no limit
+        :param maxTime: the number of seconds after which the search stops, None for no limit
+        :param info: an optional function called with (depth, score, nodes, principalVariation) after each iteration
+        :param startDepth: the depth of the first iteration
+        :return: the tuple (bestMove, score, principalVariation), bestMove is None if there are no valid moves
+        :rtype: tuple
+        """
+        start = time.perf_counter()
+        self.nodes = 0
+        self.depth = 0
+        self.interrupted = False
+        self.maxNodes = maxNodes
+        self.deadline = start + maxTime if maxTime is not None else None
+        self.nextCheck = CHECK_INTERVAL
+        self.tt.newSearch()
+        if self.orderer is not None:
+            self.orderer.newSearch()
+        moves = gs.validMoves
+        if not moves:
+            self.elapsed = time.perf_counter() - start
+            return None, -MATE_SCORE if gs.isCheck() else 0, []
+        # any move is better than none, if not even the first iteration completes
+        bestMove, score, principalVariation = moves[0], 0, [moves[0]]
+        for depth in range(min(startDepth, maxDepth), min(maxDepth, MAX_DEPTH) + 1):
+            movesMade = len(gs.moveLog)
+            try:
+                score = self.searchRoot(gs, depth, score)
+            except SearchTimeout:
+                # take back the moves of the interrupted iteration
+                while len(gs.moveLog) > movesMade:
+                    gs.undoMove()
+                self.interrupted = True
+                break
+            principalVariation = self.pvTable[0][:]
+            bestMove = principalVariation[0]
+            self.depth = depth
+            if info is not None:
+                info(depth, score, self.nodes, principalVariation)
+            if abs(score) > MATE_THRESHOLD:
+                break  # a mate was found, searching deeper finds no shorter one
+        self.elapsed = time.perf_counter() - start
+        return bestMove, score, principalVariation
+
+    def evaluatePosition(self, gs):
+        return evaluate(gs, self.pawnTable)
+
+    def searchRoot(self, gs, depth, lastScore):
+        """
+        Searches one iteration. With aspiration windows the search starts with a narrow window around the score of
+        the last iteration, the window is widened on the side the score falls outside of it until it fits.
+        """
+        config = self.config
+        if not config.aspirationWindows or depth < config.aspirationMinDepth or abs(lastScore) > MATE_THRESHOLD:
+            return self.negamax(gs, depth, -INFINITY, INFINITY, 0)
+        window = config.aspirationWindow
+        alpha, beta = lastScore - window, lastScore + window
+        while True:
+            score = self.negamax(gs, depth, alpha, beta, 0)
+            if score <= alpha:
+                alpha = max(alpha - window, -INFINITY)
+            elif score >= beta:
+                beta = min(beta + window, INFINITY)
+            else:
+                return score
+            window *= 2
+
+    def checkBudget(self):
+        self.nextCheck = self.nodes + CHECK_INTERVAL
+        if self.maxNodes is not None and self.nodes >= self.maxNodes:
+            raise SearchTimeout()
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+        if self.stopCondition is not None and self.stopCondition():
+            raise SearchTimeout()
+
+    def negamax(self, gs, depth, alpha, beta, ply, allowNullMove=True):
+        """
+        :param allowNullMove: False right after a null move, so that two null moves don't follow each other
+        :return: the score of the position for the player to move, searched to the given depth
+        :rtype: int
+        """
+        self.nodes += 1
+        if self.nodes >= self.nextCheck:
+            self.checkBudget()
+        self.pvTable[ply] = []
+        if ply > 0 and (gs.isRepetition() or gs.halfmoveClock >= FIFTY_MOVE_PLIES or gs.isInsufficientMaterial()):
+            # a position that occurred before is a draw, as repeating it again can't be prevented
+            return 0
+
+        ttMove = None
+        entry = self.tt.probe(gs.hash)
+        if entry is not None:
+            entryDepth, entryScore, bound, ttMove = entry
+            if entryDepth >= depth and ply > 0:
+                entryScore = scoreFromTable(entryScore, ply)
+                if (bound == EXACT or bound == LOWER_BOUND and entryScore >= beta
+                        or bound == UPPER_BOUND and entryScore <= alpha):
+                    return entryScore
+
+        if depth == 0 or ply >= MAX_DEPTH:
+            if self.quiescence:
+                return self.quiescenceSearch(gs, alpha, beta, ply)
+            return self.evaluate(gs)
+
+        config = self.config
+        inCheck = gs.isCheck()
+        if (config.nullMovePruning and allowNullMove and ply > 0 and not inCheck and depth >= config.nullMoveMinDepth
+                and beta < MATE_THRESHOLD and self.hasPieces(gs)):
+            # if passing the turn still fails high, a real move will too, except in zugzwang, which is rare as long as
+            # the player has other pieces than pawns
+            gs.makeNullMove()
+            score = -self.negamax(gs, depth - 1 - config.nullMoveReduction, -beta, -beta + 1, ply + 1, False)
+            gs.undoNullMove()
+            if score >= beta:
+                return beta
+
+        moves = gs.validMoves
+        if not moves:
+            return -MATE_SCORE + ply if inCheck else 0
+        if self.orderer is not None:
+            moves = self.orderer.orderMoves(moves, ply, ttMove, gs)
+        elif ttMove:
+            # search the best move of an earlier search first
+            fromIndex, toIndex = unpackMove(ttMove)
+            moves = sorted(moves, key=lambda move: move.fromIndex != fromIndex or move.toIndex != toIndex)
+
+        originalAlpha = alpha
+        bestScore = -INFINITY
+        bestMove = None
+        for moveNumber, move in enumerate(moves):
+            gs.makeMove(move)
+            reduction = 0
+            if (config.lateMoveReductions and depth >= config.lateMoveMinDepth
+                    and moveNumber >= config.lateMoveMinNumber and not inCheck
+                    and not move.isCapture() and not move.isPromotion() and not gs.isCheck()):
+                # quiet moves late in the order rarely are the best ones
+                reduction = 1 if moveNumber < 2 * config.lateMoveMinNumber else 2
+            if moveNumber == 0:
+                score = -self.negamax(gs, depth - 1, -beta, -alpha, ply + 1)
+            elif config.principalVariationSearch:
+                # prove with a null window that the move is not better than the best one so far
+                score = -self.negamax(gs, depth - 1 - reduction, -alpha - 1, -alpha, ply + 1)
+                if reduction and score > alpha:
+                    score = -self.negamax(gs, depth - 1, -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self.negamax(gs, depth - 1, -beta, -alpha, ply + 1)
+            else:
+                score = -self.negamax(gs, depth - 1 - reduction, -beta, -alpha, ply + 1)
+                if reduction and score > alpha:
+                    score = -self.negamax(gs, depth - 1, -beta, -alpha, ply + 1)
+            gs.undoMove()
+            if score > bestScore:
+                bestScore = score
+                bestMove = move
+                if score > alpha:
+                    alpha = score
+                    self.pvTable[ply] = [move] + self.pvTable[ply + 1]
+                    if score >= beta:
+                        if self.orderer is not None:
+                            self.orderer.recordCutoff(move, ply, depth, moveNumber)
+                        break
+
+        if bestScore >= beta:
+            bound = LOWER_BOUND
+        elif bestScore > originalAlpha:
+            bound = EXACT
+        else:
+            bound = UPPER_BOUND
+        self.tt.store(gs.hash, depth, scoreToTable(bestScore, ply), bound, bestMove)
+        return bestScore
+
+    @staticmethod
+    def hasPieces(gs):
+        """
+        :return: True if the player to move has other pieces than pawns and the king
+        :rtype: bool
+        """
+        color = 'w' if gs.whiteToMove else 'b'
+        return gs.colorBitboards[color] != gs.bitboards[color + 'p'] | gs.bitboards[color + 'K']
+
+    def quiescenceSearch(self, gs, alpha, beta, ply):
+        """
+        Searches only the captures and promotions until the position is quiet, so that the evaluation at the leaves
+        doesn't miss a piece hanging after the last move. The player to move may also stand pat, keeping the static
+        evaluation instead of capturing. Captures that can't raise the score to alpha or lose material are skipped.
+        A player in check has to search all the moves instead.
+        :return: the score of the position for the player to move
+        :rtype: int
+        """
+        self.nodes += 1
+        if self.nodes >= self.nextCheck:
+            self.checkBudget()
+        if ply >= MAX_DEPTH:
+            return self.evaluate(gs)
+
+        inCheck = gs.isCheck()
+        if inCheck:
+            moves = gs.validMoves
+            if not moves:
+                return -MATE_SCORE + ply
+            bestScore = -INFINITY
+            standPat = None
+        else:
+            standPat = bestScore = self.evaluate(gs)
+            if standPat >= beta:
+                return standPat
+            alpha = max(alpha, standPat)
+            moves = gs.calculateCaptureMoves()
+            moves.sort(key=mvvLva, reverse=True)
+
+        for move in moves:
+            if standPat is not None and not move.isPromotion():
+                # delta pruning: skip captures that can't raise the score to alpha
+                gain = PIECE_VALUES[move.pieceCaptured[1]] if move.pieceCaptured != "--" else PIECE_VALUES['p']
+                if standPat + gain + DELTA_MARGIN <= alpha:
+                    continue
+                # captures that lose material by static exchange evaluation are not searched
+                if PIECE_VALUES[move.pieceMoved[1]] > gain and gs.staticExchangeEvaluation(move) < 0:
+                    continue
+            gs.makeMove(move)
+            score = -self.quiescenceSearch(gs, -beta, -alpha, ply + 1)
+            gs.undoMove()
+            if score > bestScore:
+                bestScore = score
+                if score > alpha:
+                    alpha = score
+                    if score >= beta:
+                        break
+        return bestScore
+
+
+def benchmarkConfigs():
+    """
+    :return: the configurations compared by the benchmark: all techniques, each one turned off and none of them
+    :rtype: list
+    """
+    names = ("principalVariationSearch", "nullMovePruning", "lateMoveReductions", "aspirationWindows")
+    configs = [SearchConfig()]
+    for name in names:
+        config = SearchConfig()
+        setattr(config, name, False)
+        configs.append(config)
+    configs.append(SearchConfig(False, False, False, False))
+    return configs
+
+
+def benchmark(depth, configs=None, positions=BENCHMARK_POSITIONS, hashSizeMB=16):
+    """
+    Searches each position to the given depth with each configuration, starting with an empty transposition table.
+    :return: a list of tuples (config, nodes, seconds) with the totals over all positions
+    :rtype: list
+    """
+    results = []
+    for config in configs if configs is not None else benchmarkConfigs():
+        nodes = 0
+        elapsed = 0.0
+        for fen in positions:
+            gs = GameState()
+            gs.setFen(fen)
+            search = Search(TranspositionTable(hashSizeMB), config=config)
+            search.search(gs, depth)
+            nodes += search.nodes
+            elapsed += search.elapsed
+        results.append((config, nodes, elapsed))
+    return results
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Search the best move of a position.")
+    parser.add_argument("--fen", help="the position in Forsyth-Edwards Notation, the start position if omitted")
+    parser.add_argument("--depth", type=int, default=MAX_DEPTH)
+    parser.add_argument("--nodes", type=int, help="the maximum number of nodes to search")
+    parser.add_argument("--time", type=float, default=5.0, help="the maximum number of seconds to search")
+    parser.add_argument("--hash", type=int, default=16, help="the size of the transposition table in megabytes")
+    parser.add_argument("--no-ordering", action="store_true", help="only search the transposition table move first")
+    parser.add_argument("--no-quiescence", action="store_true", help="evaluate the leaves without searching captures")
+    parser.add_argument("--weights", help="a .npz file of weights to evaluate with the neural network, needs NumPy")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="count the nodes searched to the given depth with each selective search technique off")
+    args = parser.parse_args(args)
+
+    if args.benchmark:
+        depth = args.depth if args.depth != MAX_DEPTH else 5
+        for config, nodes, elapsed in benchmark(depth, hashSizeMB=args.hash):
+            print(f"{nodes:>9} nodes {elapsed:8.2f}s  {config}")
+        return 0
+
+    gs = GameState()
+    gs.setFen(args.fen if args.fen else START_FEN)
+    evaluate = None
+    if args.weights:
+        from .NeuralEvaluation import Accumulator, loadWeights
+        accumulator = Accumulator(loadWeights(args.weights))
+        accumulator.attach(gs)
+        evaluate = accumulator.evaluate
+    search = Search(TranspositionTable(args.hash), evaluate, moveOrdering=not args.no_ordering,
+                    quiescence=not args.no_quiescence)
+    start = time.perf_counter()
+
+    def info(depth, score, nodes, principalVariation):
+        elapsed = time.perf_counter() - start
+        print(f"depth {depth:>2} score {score:>6} nodes {nodes:>9} nps {nodes / elapsed if elapsed else 0:>8.0f} "
+              f"pv {' '.join(moveToCoordinates(move) for move in principalVariation)}")
+
+    bestMove, score, principalVariation = search.search(gs, args.depth, args.nodes, args.time, info)
+    if search.orderer is not None:
+        print(f"first move cutoff rate {search.orderer.firstMoveCutoffRate():.1%}")
+    print(f"pawn hash hit rate {search.pawnTable.hitRate():.1%}")
+    print("bestmove", moveToCoordinates(bestMove) if bestMove else "(none)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Move ordering for the search. Alpha-beta prunes the most when the best move of a position is searched first, so
+the moves are sorted by how likely they are to cause a cutoff: the best move stored in the transposition table,
+then captures and promotions by most valuable victim / least valuable attacker, then the killer moves of the ply,
+then the other quiet moves by their history score, and last the captures that lose material by static exchange
+evaluation.
+"""
+from .ChessEngine import PIECE_VALUES
+from .TranspositionTable import unpackMove
+
+# the values used to order captures, the king can't be captured but can capture
+ORDER_VALUES = {'p': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 10}
+MAX_PLY = 128
+KILLER_SLOTS = 2
+
+# the scores of the groups of moves, each group is ordered within its range
+TT_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 28
+KILLER_SCORE = 1 << 26  # minus the slot number
+HISTORY_LIMIT = 1 << 24  # the history scores are halved before they reach the killer scores
+LOSING_CAPTURE_SCORE = -CAPTURE_SCORE
+
+
+def mvvLva(move):
+    """
+    :return: the most valuable victim / least valuable attacker score of a capture or promotion
+    :rtype: int
+    """
+    # a capture en passant has no piece on the target square
+    victim = ORDER_VALUES[move.pieceCaptured[1]] if move.pieceCaptured != "--" else ORDER_VALUES['p']
+    if move.isPromotion():
+        victim += ORDER_VALUES['Q']
+    return victim * 16 - ORDER_VALUES[move.pieceMoved[1]]
+
+
+class MoveOrderer:
+    """
+    Keeps the killer moves and the history table between the nodes of a search, and counts how often the first
+    searched move of a node already causes the cutoff.
+    The killer moves of a ply are the last quiet moves that caused a cutoff at that ply. The history table holds for
+    each piece and target square how much its quiet moves caused cutoffs, weighted by the square of the depth.
+    """
+
+    def __init__(self):
+        self.killers = [[None] * KILLER_SLOTS for ply in range(MAX_PLY)]
+        self.history = {}
+        self.cutoffs = 0
+        self.firstMoveCutoffs = 0
+
+    def clear(self):
+        self.killers = [[None] * KILLER_SLOTS for ply in range(MAX_PLY)]
+        self.history = {}
+        self.cutoffs = self.firstMoveCutoffs = 0
+
+    def newSearch(self):
+        """
+        The killers belong to the positions of the last search, the history is kept but weighs less.
+        """
+        self.killers = [[None] * KILLER_SLOTS for ply in range(MAX_PLY)]
+        for scores in self.history.values():
+            for index in range(64):
+                scores[index] //= 4
+        self.cutoffs = self.firstMoveCutoffs = 0
+
+    def scoreMove(self, move, ply, ttMove=None, gs=None):
+        """
+        :param ttMove: the bit indices (fromIndex, toIndex) of the best move from the transposition table, or None
+        :param gs: the GameState the move is made in, to find the losing captures, or None to treat all captures alike
+        :return: the ordering score of the move, higher scores are searched first
+        :rtype: int
+        """
+        if ttMove is not None and (move.fromIndex, move.toIndex) == ttMove:
+            return TT_MOVE_SCORE
+        if move.isCapture() or move.isPromotion():
+            # only a capture by a more valuable piece can lose material
+            if (gs is not None and move.pieceCaptured != "--"
+                    and PIECE_VALUES[move.pieceMoved[1]] > PIECE_VALUES[move.pieceCaptured[1]]
+                    and gs.staticExchangeEvaluation(move) < 0):
+                return LOSING_CAPTURE_SCORE + mvvLva(move)
+            return CAPTURE_SCORE + mvvLva(move)
+        killers = self.killers[ply] if ply < MAX_PLY else ()
+        for slot, killer in enumerate(killers):
+            if killer == (move.fromIndex, move.toIndex):
+                return KILLER_SCORE - slot
+        scores = self.history.get(move.pieceMoved)
+        return scores[move.toIndex] if scores is not None else 0
+
+    def orderMoves(self, moves, ply, ttMove=0, gs=None):
+        """
+        :param ttMove: the packed best move from the transposition table, 0 for none
+        :param gs: the GameState the moves are made in, see scoreMove
+        :return: a new list with the moves in the order they should be searched
+        :rtype: list
+        """
+        ttMove = unpackMove(ttMove) if ttMove else None
+        return sorted(moves, key=lambda move: self.scoreMove(move, ply, ttMove, gs), reverse=True)
+
+    def recordCutoff(self, move, ply, depth, moveNumber):
+        """
+        Called when a move caused a beta cutoff.
+        :param moveNumber: the position of the move in the order it was searched, starting with 0
+        """
+        self.cutoffs += 1
+        if moveNumber == 0:
+            self.firstMoveCutoffs += 1
+        if move.isCapture() or move.isPromotion():
+            return
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            key = (move.fromIndex, move.toIndex)
+            if killers[0] != key:
+                killers[1:] = killers[:-1]
+                killers[0] = key
+        scores = self.history.get(move.pieceMoved)
+        if scores is None:
+            scores = self.history[move.pieceMoved] = [0] * 64
+        scores[move.toIndex] += depth * depth
+        if scores[move.toIndex] >= HISTORY_LIMIT:
+            for scores in self.history.values():
+                for index in range(64):
+                    scores[index] //= 2
+
+    def firstMoveCutoffRate(self):
+        """
+        :return: the share of the cutoffs that were caused by the first move searched, the higher the better
+        :rtype: float
+        """
+        return self.firstMoveCutoffs / self.cutoffs if self.cutoffs else 0.0
@@ -0,0 +1,212 @@
+"""
+Optional neural evaluation in the style of NNUE: a network of two layers over 768 piece-square features (one for
+each piece on each square). The first layer is a sum of the weight rows of the features present, the accumulator.
+A move only adds and removes a few features, so instead of computing the first layer from scratch the accumulator
+is updated by GameState.setPieceAt, which every change of the board goes through, in makeMove and undoMove alike.
+Only the small second layer is computed per evaluation. The network runs in NumPy on the CPU.
+The weights are loaded from a .npz file, see saveWeights. Run it from the repository root to compare the
+incremental accumulator with computing it from scratch, e.g.
+    python -m src.NeuralEvaluation --weights weights.npz
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from .ChessEngine import PIECES, MIDDLEGAME_SCORES, START_FEN, GameState, iterateBits
+
+FEATURES = 12 * 64
+# the first feature of each piece, the feature of a piece on a square is its offset plus the bit index
+FEATURE_OFFSETS = {piece: number * 64 for number, piece in enumerate(PIECES)}
+
+
+class Network:
+    """
+    The weights: the first layer is quantized to integers, so that the accumulator is updated exactly, without
+    rounding errors building up over many moves. Its output is clipped to [0, clip] and scaled to [0, 1] (clipped
+    ReLU), the second layer maps it to a score in centipawns from the point of view of white.
+    """
+
+    def __init__(self, weights1, bias1, weights2, bias2, clip=127):
+        """
+        :param weights1: a (768, hidden) integer array, the weight row of each feature
+        :param bias1: a (hidden,) integer array
+        :param weights2: a (hidden,) float array
+        :param bias2: a float
+        :param clip: the upper bound of the first layer's output
+        """
+        self.weights1 = np.asarray(weights1, dtype=np.int32)
+        self.bias1 = np.asarray(bias1, dtype=np.int32)
+        self.weights2 = np.asarray(weights2, dtype=np.float32) / clip
+        self.bias2 = float(bias2)
+        self.clip = clip
+        if self.weights1.shape != (FEATURES, len(self.bias1)) or self.weights2.shape != self.bias1.shape:
+            raise ValueError("the shapes of the weights don't fit together")
+
+    @property
+    def hidden(self):
+        return len(self.bias1)
+
+    def output(self, accumulator):
+        """
+        :param accumulator: the (hidden,) output of the first layer before the activation
+        :return: the score from the point of view of white
+        :rtype: float
+        """
+        return float(np.clip(accumulator, 0, self.clip) @ self.weights2) + self.bias2
+
+
+def loadWeights(path):
+    """
+    :param path: a .npz file as written by saveWeights
+    :rtype: Network
+    """
+    with np.load(path) as data:
+        return Network(data["weights1"], data["bias1"], data["weights2"], float(data["bias2"]), int(data["clip"]))
+
+
+def saveWeights(network, path):
+    np.savez(path, weights1=network.weights1, bias1=network.bias1, weights2=network.weights2 * network.clip,
+             bias2=network.bias2, clip=network.clip)
+
+
+def randomNetwork(hidden=64, seed=0):
+    """
+    :return: a network with small random weights, for benchmarks and tests
+    :rtype: Network
+    """
+    rng = np.random.default_rng(seed)
+    return Network(rng.integers(-8, 9, size=(FEATURES, hidden)), rng.integers(0, 64, size=hidden),
+                   rng.normal(0, 10, size=hidden), 0.0)
+
+
+def pieceSquareNetwork(hidden=2):
+    """
+    :return: a network computing the middlegame score of GameState.evaluate, as a starting point for training: the
+    first hidden unit sums the positive, the second the negative part of the score
+    :rtype: Network
+    """
+    clip = 1 << 16
+    weights1 = np.zeros((FEATURES, hidden), dtype=np.int32)
+    for piece in PIECES:
+        offset = FEATURE_OFFSETS[piece]
+        weights1[offset:offset + 64, 0] = MIDDLEGAME_SCORES[piece]
+        weights1[offset:offset + 64, 1] = [-score for score in MIDDLEGAME_SCORES[piece]]
+    weights2 = np.zeros(hidden)
+    weights2[:2] = clip, -clip
+    return Network(weights1, np.zeros(hidden), weights2, 0.0, clip)
+
+
+class Accumulator:
+    """
+    The first layer output of the network for the position of one GameState, updated as pieces are added to and
+    removed from the board. Attach it to the GameState with attach, evaluate with evaluate.
+    """
+
+    def __init__(self, network):
+        self.network = network
+        self.values = network.bias1.copy()
+
+    def attach(self, gs):
+        """
+        Computes the accumulator for the position of the GameState and keeps it up to date from now on.
+        """
+        gs.accumulator = self
+        self.refresh(gs)
+
+    @staticmethod
+    def detach(gs):
+        gs.accumulator = None
+
+    def refresh(self, gs):
+        """
+        Computes the accumulator from scratch, called when the board of the GameState is replaced.
+        """
+        self.values = self.network.bias1.copy()
+        features = [FEATURE_OFFSETS[piece] + index for piece in PIECES for index in iterateBits(gs.bitboards[piece])]
+        if features:
+            self.values += self.network.weights1[features].sum(axis=0)
+
+    def addPiece(self, piece, index):
+        self.values += self.network.weights1[FEATURE_OFFSETS[piece] + index]
+
+    def removePiece(self, piece, index):
+        self.values -= self.network.weights1[FEATURE_OFFSETS[piece] + index]
+
+    def evaluate(self, gs):
+        """
+        :return: the score of the position of the GameState in centipawns from the point of view of the player to move
+        :rtype: int
+        """
+        score = int(self.network.output(self.values))
+        return score if gs.whiteToMove else -score
+
+
+def evaluateFromScratch(network, gs):
+    """
+    Computes both layers for the position, as without an accumulator.
+    :return: the score in centipawns from the point of view of the player to move
+    :rtype: int
+    """
+    accumulator = Accumulator(network)
+    accumulator.refresh(gs)
+    return accumulator.evaluate(gs)
+
+
+def benchmark(network, positions=2000, seed=0):
+    """
+    Plays random moves and evaluates each position, once with the incrementally updated accumulator and once
+    computing it from scratch.
+    :return: the tuple (incrementalSeconds, fromScratchSeconds, evaluations)
+    :rtype: tuple
+    """
+    rng = random.Random(seed)
+    moves = []
+    gs = GameState()
+    gs.setFen(START_FEN)
+    while len(moves) < positions:
+        if not gs.validMoves or len(gs.moveLog) >= 80:
+            gs.setFen(START_FEN)
+            moves.append(None)
+            continue
+        move = rng.choice(gs.validMoves)
+        moves.append(move)
+        gs.makeMove(move)
+
+    def replay(evaluate, attach):
+        gs = GameState()
+        gs.setFen(START_FEN)
+        if attach:
+            Accumulator(network).attach(gs)
+        start = time.perf_counter()
+        for move in moves:
+            if move is None:
+                gs.setFen(START_FEN)
+                continue
+            gs.makeMove(move)
+            evaluate(gs)
+        return time.perf_counter() - start
+
+    incremental = replay(lambda gs: gs.accumulator.evaluate(gs), True)
+    fromScratch = replay(lambda gs: evaluateFromScratch(network, gs), False)
+    return incremental, fromScratch, sum(move is not None for move in moves)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Compare the incremental and the from scratch neural evaluation.")
+    parser.add_argument("--weights", help="a .npz file of weights, a random network if omitted")
+    parser.add_argument("--hidden", type=int, default=64, help="the hidden layer size of the random network")
+    parser.add_argument("--positions", type=int, default=2000)
+    args = parser.parse_args(args)
+    network = loadWeights(args.weights) if args.weights else randomNetwork(args.hidden)
+    incremental, fromScratch, evaluations = benchmark(network, args.positions)
+    print(f"hidden layer size {network.hidden}, {evaluations} moves made and evaluated")
+    print(f"incremental:  {incremental:.3f}s  {evaluations / incremental:8.0f} evaluations/s")
+    print(f"from scratch: {fromScratch:.3f}s  {evaluations / fromScratch:8.0f} evaluations/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+Parallel search with Lazy SMP: several worker processes search the same position at the same time, each on its own
+GameState, and share one transposition table in a multiprocessing.shared_memory block. Threads would not help, as
+the search is pure Python and only one thread runs at a time. The workers don't split the tree between them, they
+profit from the entries the others store: a worker finds the scores and best moves of the positions another has
+already searched. Half the workers start one iteration deeper, so that they run ahead and fill the table for the
+others. The search stops as soon as one worker has completed the last iteration.
+Run it from the repository root to search a position, or to measure how the time to reach a depth scales with the
+number of workers, e.g.
+    python -m src.ParallelSearch --workers 8 --depth 6
+    python -m src.ParallelSearch --scaling --workers 8 --depth 6
+"""
+import argparse
+import os
+import sys
+import time
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+from .ChessEngine import GameState, START_FEN, moveToCoordinates
+from .ChessSearch import Search, MAX_DEPTH
+from .TranspositionTable import TranspositionTable, tableBytes
+
+# the search of a worker process, kept over all the searches the process runs, see initializeWorker
+workerSearch = None
+workerMemory = None
+workerStopFlag = 0
+
+
+def initializeWorker(sharedName, sizeMB):
+    """
+    Runs in each worker process when the pool starts: attaches the shared transposition table.
+    """
+    global workerSearch, workerMemory, workerStopFlag
+    workerMemory = SharedMemory(name=sharedName)
+    workerSearch = Search(TranspositionTable(sizeMB, workerMemory.buf))
+    workerStopFlag = tableBytes(sizeMB)
+    workerSearch.stopCondition = lambda: workerMemory.buf[workerStopFlag] != 0
+
+
+def searchWorker(gs, workerId, maxDepth, maxNodes, maxTime):
+    """
+    Runs in a worker process: searches the position until its own budget is used up or another worker has completed
+    the last iteration. If this worker completes the last iteration, it tells the others to stop.
+    :param gs: a clone of the GameState without history, which keeps the hashes of the positions it can repeat, see
+    GameState.clone
+    :return: the tuple (workerId, depth, score, principalVariation, nodes), the moves of the principal variation as
+    tuples of bit indices (fromIndex, toIndex)
+    :rtype: tuple
+    """
+    bestMove, score, principalVariation = workerSearch.search(gs, maxDepth, maxNodes, maxTime,
+                                                              startDepth=1 + workerId % 2)
+    if not workerSearch.interrupted:
+        workerMemory.buf[workerStopFlag] = 1
+    principalVariation = [(move.fromIndex, move.toIndex) for move in principalVariation]
+    return workerId, workerSearch.depth, score, principalVariation, workerSearch.nodes
+
+
+class ParallelSearch:
+    """
+    A pool of worker processes sharing a transposition table. The pool and the table are kept over searches, use it
+    as a context manager to release them. The statistics of the last search are kept in nodes (the sum over all the
+    workers), depth and elapsed.
+    """
+
+    def __init__(self, workers=None, sizeMB=16):
+        """
+        :param workers: the number of worker processes, one per CPU core if None
+        :param sizeMB: the size of the shared transposition table in megabytes
+        """
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.sizeMB = sizeMB
+        # the table followed by the stop flag
+        self.memory = SharedMemory(create=True, size=tableBytes(sizeMB) + 1)
+        self.pool = Pool(self.workers, initializeWorker, (self.memory.name, sizeMB))
+        self.nodes = 0
+        self.depth = 0
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+            self.memory.close()
+            self.memory.unlink()
+
+    def search(self, gs, maxDepth=MAX_DEPTH, maxNodes=None, maxTime=None):
+        """
+        Searches the position of the GameState with all the workers, see Search.search.
+        :param maxNodes: the number of nodes after which each worker stops, None for no limit
+        :return: the tuple (bestMove, score, principalVariation) of the worker that completed the deepest iteration,
+        bestMove is None if there are no valid moves
+        :rtype: tuple
+        """
+        start = time.perf_counter()
+        self.memory.buf[tableBytes(self.sizeMB)] = 0
+        position = gs.clone()
+        pending = [self.pool.apply_async(searchWorker, (position, workerId, maxDepth, maxNodes, maxTime))
+                   for workerId in range(self.workers)]
+        results = [result.get() for result in pending]
+        self.elapsed = time.perf_counter() - start
+        self.nodes = sum(result[4] for result in results)
+        # the deepest iteration wins, the first worker on equal depths
+        workerId, self.depth, score, principalVariation, nodes = max(results, key=lambda result: (result[1],
+                                                                                                  -result[0]))
+        if not gs.validMoves:
+            return None, score, []
+        principalVariation = self.movesOf(gs, principalVariation)
+        return (principalVariation[0] if principalVariation else gs.validMoves[0]), score, principalVariation
+
+    @staticmethod
+    def movesOf(gs, indices):
+        """
+        :param indices: a sequence of moves from the position of the GameState as tuples (fromIndex, toIndex)
+        :return: the Move objects of the sequence, the GameState is left as it was
+        :rtype: list
+        """
+        moves = []
+        for fromIndex, toIndex in indices:
+            move = next((move for move in gs.validMoves if (move.fromIndex, move.toIndex) == (fromIndex, toIndex)),
+                        None)
+            if move is None:
+                break
+            moves.append(move)
+            gs.makeMove(move)
+        for move in moves:
+            gs.undoMove()
+        return moves
+
+
+def scaling(gs, depth, maxWorkers, sizeMB=16):
+    """
+    Searches the position to the given depth with 1, 2, 4, ... up to maxWorkers workers, each time with a new pool
+    and an empty table. The speedup is the time of one worker divided by the time of n workers, the efficiency the
+    speedup divided by n.
+    :return: a list of tuples (workers, seconds, nodes, speedup, efficiency)
+    :rtype: list
+    """
+    counts = []
+    workers = 1
+    while workers < maxWorkers:
+        counts.append(workers)
+        workers *= 2
+    counts.append(maxWorkers)
+    results = []
+    for workers in counts:
+        with ParallelSearch(workers, sizeMB) as parallelSearch:
+            parallelSearch.search(gs, depth)
+            seconds, nodes = parallelSearch.elapsed, parallelSearch.nodes
+        speedup = results[0][1] / seconds if results else 1.0
+        results.append((workers, seconds, nodes, speedup, speedup / workers))
+    return results
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Search the best move of a position with several processes.")
+    parser.add_argument("--fen", help="the position in Forsyth-Edwards Notation, the start position if omitted")
+    parser.add_argument("--depth", type=int, default=MAX_DEPTH)
+    parser.add_argument("--time", type=float, help="the maximum number of seconds to search")
+    parser.add_argument("--workers", type=int, default=0, help="the number of worker processes, 0 for one per core")
+    parser.add_argument("--hash", type=int, default=16, help="the size of the transposition table in megabytes")
+    parser.add_argument("--scaling", action="store_true",
+                        help="measure the time to the given depth with 1, 2, 4, ... up to the given workers")
+    args = parser.parse_args(args)
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+
+    gs = GameState()
+    gs.setFen(args.fen if args.fen else START_FEN)
+    if args.scaling:
+        depth = args.depth if args.depth != MAX_DEPTH else 6
+        for count, seconds, nodes, speedup, efficiency in scaling(gs, depth, workers, args.hash):
+            print(f"{count:>3} workers {seconds:8.2f}s {nodes:>10} nodes  speedup {speedup:5.2f}  "
+                  f"efficiency {efficiency:6.1%}")
+        return 0
+
+    maxTime = args.time if args.time is not None or args.depth != MAX_DEPTH else 5.0
+    with ParallelSearch(workers, args.hash) as parallelSearch:
+        bestMove, score, principalVariation = parallelSearch.search(gs, args.depth, maxTime=maxTime)
+        print(f"depth {parallelSearch.depth:>2} score {score:>6} nodes {parallelSearch.nodes:>9} "
+              f"time {parallelSearch.elapsed:.2f}s "
+              f"pv {' '.join(moveToCoordinates(move) for move in principalVariation)}")
+    print("bestmove", moveToCoordinates(bestMove) if bestMove else "(none)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
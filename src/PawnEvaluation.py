@@ -0,0 +1,137 @@
+"""
+Evaluation of the pawn structure: doubled, isolated, backward and passed pawns. The terms only depend on the pawns,
+which move rarely, so the scores are cached in a PawnHashTable by the pawn hash of the GameState.
+"""
+from array import array
+
+from .ChessEngine import MAX_PHASE, iterateBits
+
+# (middlegame, endgame) scores of the pawn structure terms, for each pawn concerned
+DOUBLED_PAWN = (-10, -20)  # for each pawn on a column beyond the first one
+ISOLATED_PAWN = (-10, -15)
+BACKWARD_PAWN = (-8, -10)
+# the bonus of a passed pawn by the number of rows it has advanced from its start row
+PASSED_PAWN = ((0, 0), (5, 10), (10, 20), (15, 35), (30, 60), (50, 100))
+
+COLUMNS = [sum(1 << (row * 8 + col) for row in range(8)) for col in range(8)]
+ADJACENT_COLUMNS = [(COLUMNS[col - 1] if col > 0 else 0) | (COLUMNS[col + 1] if col < 7 else 0) for col in range(8)]
+# the squares of the rows in front of a row, from the point of view of each color
+ROWS_IN_FRONT = {"w": [(1 << (row * 8)) - 1 for row in range(8)],
+                 "b": [((1 << 64) - 1) ^ ((1 << (row * 8 + 8)) - 1) for row in range(8)]}
+# for each square, the squares on the same and the adjacent columns in front of it: a pawn is passed if there are no
+# pawns of the opponent on them
+PASSED_MASKS = {color: [ROWS_IN_FRONT[color][index // 8] & (COLUMNS[index % 8] | ADJACENT_COLUMNS[index % 8])
+                        for index in range(64)] for color in "wb"}
+# for each square, the squares on the adjacent columns on the same row or behind it: a pawn without pawns of its own
+# there can't be protected by other pawns when it advances
+SUPPORT_MASKS = {color: [ADJACENT_COLUMNS[index % 8] & ~ROWS_IN_FRONT[color][index // 8] for index in range(64)]
+                 for color in "wb"}
+
+
+def pawnAttacks(pawns, color):
+    """
+    :return: a bitboard of the squares attacked by the given pawns
+    :rtype: int
+    """
+    notLeftColumn = ~COLUMNS[0] & ((1 << 64) - 1)
+    notRightColumn = ~COLUMNS[7] & ((1 << 64) - 1)
+    if color == 'w':
+        return (pawns & notLeftColumn) >> 9 | (pawns & notRightColumn) >> 7
+    return ((pawns & notLeftColumn) << 7 | (pawns & notRightColumn) << 9) & ((1 << 64) - 1)
+
+
+def evaluatePawns(whitePawns, blackPawns):
+    """
+    :param whitePawns: the bitboard of the white pawns
+    :param blackPawns: the bitboard of the black pawns
+    :return: the tuple (middlegameScore, endgameScore) of the pawn structure from the point of view of white
+    :rtype: tuple
+    """
+    middlegameScore = endgameScore = 0
+    for color, pawns, opponentPawns, sign in (('w', whitePawns, blackPawns, 1), ('b', blackPawns, whitePawns, -1)):
+        opponentAttacks = pawnAttacks(opponentPawns, 'b' if color == 'w' else 'w')
+        for col in range(8):
+            count = (pawns & COLUMNS[col]).bit_count()
+            if count > 1:
+                middlegameScore += sign * DOUBLED_PAWN[0] * (count - 1)
+                endgameScore += sign * DOUBLED_PAWN[1] * (count - 1)
+        for index in iterateBits(pawns):
+            col, row = index % 8, index // 8
+            if not pawns & ADJACENT_COLUMNS[col]:
+                middlegameScore += sign * ISOLATED_PAWN[0]
+                endgameScore += sign * ISOLATED_PAWN[1]
+            elif not pawns & SUPPORT_MASKS[color][index]:
+                # the pawn can't be protected by its neighbours and can't advance safely
+                frontIndex = index - 8 if color == 'w' else index + 8
+                if opponentAttacks >> frontIndex & 1:
+                    middlegameScore += sign * BACKWARD_PAWN[0]
+                    endgameScore += sign * BACKWARD_PAWN[1]
+            # of doubled pawns only the front one can be passed
+            passedMask = PASSED_MASKS[color][index]
+            if not opponentPawns & passedMask and not pawns & passedMask & COLUMNS[col]:
+                advanced = 6 - row if color == 'w' else row - 1
+                middlegameScore += sign * PASSED_PAWN[advanced][0]
+                endgameScore += sign * PASSED_PAWN[advanced][1]
+    return middlegameScore, endgameScore
+
+
+class PawnHashTable:
+    """
+    A fixed size cache of the pawn structure scores, indexed by the pawn hash of a GameState. Each slot is
+    always replaced, as the positions of a search mostly share a few pawn structures.
+    """
+
+    def __init__(self, entries=1 << 14):
+        """
+        :param entries: the number of slots, rounded down to a power of two
+        """
+        size = 1
+        while size * 2 <= entries:
+            size *= 2
+        self.mask = size - 1
+        self.keys = array('Q', bytes(size * 8))
+        self.middlegameScores = array('l', bytes(size * array('l').itemsize))
+        self.endgameScores = array('l', bytes(size * array('l').itemsize))
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def clear(self):
+        self.keys = array('Q', bytes(len(self.keys) * 8))
+        self.hits = self.misses = 0
+
+    def probe(self, gs):
+        """
+        :return: the tuple (middlegameScore, endgameScore) of the pawn structure of the GameState from the point of
+        view of white, evaluated only if it isn't in the table
+        :rtype: tuple
+        """
+        pawnHash = gs.pawnHash
+        slot = pawnHash & self.mask
+        # a pawn hash of 0 (no pawns on the board) is not told apart from an empty slot, it is quick to evaluate
+        if self.keys[slot] == pawnHash and pawnHash:
+            self.hits += 1
+            return self.middlegameScores[slot], self.endgameScores[slot]
+        self.misses += 1
+        middlegameScore, endgameScore = evaluatePawns(gs.bitboards["wp"], gs.bitboards["bp"])
+        self.keys[slot] = pawnHash
+        self.middlegameScores[slot] = middlegameScore
+        self.endgameScores[slot] = endgameScore
+        return middlegameScore, endgameScore
+
+    def evaluate(self, gs):
+        """
+        :return: the pawn structure score blended by the phase of the game, from the point of view of the player to
+        move
+        :rtype: int
+        """
+        middlegameScore, endgameScore = self.probe(gs)
+        phase = min(gs.phase, MAX_PHASE)
+        score = (middlegameScore * phase + endgameScore * (MAX_PHASE - phase)) // MAX_PHASE
+        return score if gs.whiteToMove else -score
+
+    def hitRate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
@@ -0,0 +1,182 @@
+"""
+Perft: counts the leaf nodes of the tree of valid moves down to a given depth. The counts are compared to known
+values to find bugs in the move generation, and the nodes per second measure its speed.
+Run it from the repository root, e.g.
+    python -m src.Perft --position kiwipete --depth 3 --divide
+    python -m src.Perft --fen "8/8/8/8/8/8/8/K6k w - - 0 1" --depth 4
+    python -m src.Perft --suite --depth 3
+    python -m src.Perft --position kiwipete --depth 5 --workers 8 --cache
+With more than one worker the subtrees of the root moves are counted in parallel by a pool of processes.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .ChessEngine import START_FEN, gameStateFromFen, moveToCoordinates
+
+# the standard perft positions with their node counts for depth 1, 2, 3, ...
+# Where the rules of this engine differ from the official ones, so do the counts: pawns are always promoted to a
+# queen, and castling also requires the square of the rook (and b1/b8 when castling with the left rook) not to be
+# under attack.
+POSITIONS = {
+    "start": (START_FEN, (20, 400, 8902, 197281, 4865609)),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                 (48, 2035, 97656, 4056469)),
+    "endgame": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                (14, 191, 2812, 43238, 674624)),
+    "promotion": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                  (6, 222, 7859, 306476)),
+    "promotion2": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+                   (40, 1339, 51852, 1732691)),
+    "middlegame": ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+                   (46, 2079, 89890, 3894594)),
+}
+# the number of subtree counts a perft cache may hold before it is cleared
+MAX_CACHE_ENTRIES = 1000000
+
+# the cache of a worker process, kept over all the root moves the process counts
+workerCache = {}
+
+
+def perft(gs, depth, cache=None):
+    """
+    :param cache: optional dict in which the counts of subtrees are stored by position hash and depth, so that
+    subtrees reached by transposition are only counted once
+    :return: the number of leaf nodes of the tree of valid moves of the given depth, 1 for a depth of 0 or less
+    :rtype: int
+    """
+    if depth <= 0:
+        return 1
+    if depth == 1:
+        return len(gs.validMoves)
+    if cache is not None:
+        nodes = cache.get((gs.hash, depth))
+        if nodes is not None:
+            return nodes
+    nodes = 0
+    for move in gs.validMoves:
+        gs.makeMove(move)
+        nodes += perft(gs, depth - 1, cache)
+        gs.undoMove()
+    if cache is not None:
+        if len(cache) >= MAX_CACHE_ENTRIES:
+            cache.clear()
+        cache[(gs.hash, depth)] = nodes
+    return nodes
+
+
+def divide(gs, depth, cache=None):
+    """
+    :return: a list of tuples (move, nodes) with the perft count below each valid move of the position
+    :rtype: list
+    """
+    counts = []
+    for move in gs.validMoves:
+        gs.makeMove(move)
+        counts.append((move, perft(gs, depth - 1, cache)))
+        gs.undoMove()
+    return counts
+
+
+def perftRootMove(gs, fromIndex, toIndex, depth, useCache):
+    """
+    Runs in a worker process: counts the leaf nodes below one root move.
+    :param gs: a clone of the GameState without history, see GameState.clone
+    """
+    for move in gs.validMoves:
+        if move.fromIndex == fromIndex and move.toIndex == toIndex:
+            gs.makeMove(move)
+            return perft(gs, depth - 1, workerCache if useCache else None)
+    raise ValueError("no valid move from " + str(fromIndex) + " to " + str(toIndex))
+
+
+def parallelDivide(gs, depth, workers, useCache=False):
+    """
+    Like divide, but the root moves are distributed over a pool of worker processes.
+    :param workers: the number of worker processes
+    :param useCache: if each worker should cache the counts of the subtrees it has seen
+    """
+    position = gs.clone()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(perftRootMove, position, move.fromIndex, move.toIndex, depth, useCache)
+                   for move in gs.validMoves]
+        return [(move, future.result()) for move, future in zip(gs.validMoves, futures)]
+
+
+def countNodes(gs, depth, workers=1, useCache=False):
+    """
+    Runs perft serially or, with more than one worker, in parallel.
+    """
+    if workers > 1 and depth > 1:
+        return sum(nodes for move, nodes in parallelDivide(gs, depth, workers, useCache))
+    return perft(gs, depth, {} if useCache else None)
+
+
+def runSuite(depth, workers=1, useCache=False):
+    """
+    Runs perft on all the standard positions that have a known count for the given depth and prints the results.
+    :return: True if all the counts match
+    :rtype: bool
+    """
+    allCorrect = True
+    totalNodes = 0
+    totalTime = 0
+    for name, (fen, expectedCounts) in POSITIONS.items():
+        if depth > len(expectedCounts):
+            print(f"{name:<12} skipped, no known count for depth {depth}")
+            continue
+        gs = gameStateFromFen(fen)
+        start = time.perf_counter()
+        nodes = countNodes(gs, depth, workers, useCache)
+        elapsed = time.perf_counter() - start
+        totalNodes += nodes
+        totalTime += elapsed
+        correct = nodes == expectedCounts[depth - 1]
+        allCorrect = allCorrect and correct
+        print(f"{name:<12} {nodes:>10} nodes {elapsed:8.2f}s {nodes / elapsed:10.0f} nodes/s  "
+              + ("ok" if correct else f"WRONG, expected {expectedCounts[depth - 1]}"))
+    if totalTime:
+        print(f"{'total':<12} {totalNodes:>10} nodes {totalTime:8.2f}s {totalNodes / totalTime:10.0f} nodes/s")
+    return allCorrect
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Count the leaf nodes of the move tree to a given depth.")
+    parser.add_argument("--depth", type=int, default=3)
+    position = parser.add_mutually_exclusive_group()
+    position.add_argument("--fen", help="the position in Forsyth-Edwards Notation")
+    position.add_argument("--position", choices=POSITIONS, default="start", help="one of the standard positions")
+    position.add_argument("--suite", action="store_true", help="run all the standard positions and check the counts")
+    parser.add_argument("--divide", action="store_true", help="print the node count below each root move")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="the number of worker processes, 0 for one per CPU core")
+    parser.add_argument("--cache", action="store_true", help="cache the counts of subtrees by position hash")
+    args = parser.parse_args(args)
+    if args.depth < 1:
+        parser.error("the depth must be at least 1")
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+
+    if args.suite:
+        return 0 if runSuite(args.depth, workers, args.cache) else 1
+
+    gs = gameStateFromFen(args.fen if args.fen else POSITIONS[args.position][0])
+    start = time.perf_counter()
+    if args.divide:
+        if workers > 1:
+            counts = parallelDivide(gs, args.depth, workers, args.cache)
+        else:
+            counts = divide(gs, args.depth, {} if args.cache else None)
+        for move, nodes in sorted(counts, key=lambda count: moveToCoordinates(count[0])):
+            print(f"{moveToCoordinates(move)}: {nodes}")
+        nodes = sum(nodes for move, nodes in counts)
+    else:
+        nodes = countNodes(gs, args.depth, workers, args.cache)
+    elapsed = time.perf_counter() - start
+    print(f"nodes: {nodes}, time: {elapsed:.2f}s, nodes/s: {nodes / elapsed if elapsed else 0:.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
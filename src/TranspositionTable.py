@@ -0,0 +1,153 @@
+"""
+Fixed size transposition table for the search, keyed by the Zobrist hash of a GameState.
+"""
+from array import array
+
+# bound types of a stored score
+EXACT = 0
+LOWER_BOUND = 1  # the score failed high, the real score is at least this high
+UPPER_BOUND = 2  # the score failed low, the real score is at most this high
+
+ENTRY_BYTES = 16  # an entry is a 64 bit key and 64 bits of packed data
+SCORE_OFFSET = 1 << 31  # scores are stored as unsigned 32 bit integers
+
+
+def packMove(move):
+    """
+    :return: the move as a 13 bit integer, 0 for no move
+    :rtype: int
+    """
+    if move is None:
+        return 0
+    return (move.fromIndex << 6 | move.toIndex) + 1
+
+
+def unpackMove(packedMove):
+    """
+    :return: the bit indices (fromIndex, toIndex) of a packed move, None for no move
+    :rtype: tuple
+    """
+    if packedMove == 0:
+        return None
+    return (packedMove - 1) >> 6, (packedMove - 1) & 63
+
+
+def tableBytes(sizeMB):
+    """
+    :return: the number of bytes a table of the given size in megabytes uses, see TranspositionTable
+    :rtype: int
+    """
+    buckets = 1
+    while buckets * 4 * ENTRY_BYTES <= sizeMB * 1024 * 1024:
+        buckets *= 2
+    return buckets * 2 * ENTRY_BYTES
+
+
+class TranspositionTable:
+    """
+    The table is a preallocated array of buckets with two entries each. The first entry of a bucket is depth
+    preferred, it is only replaced by searches at least as deep or by entries of a newer search. The second entry is
+    always replaced. The data of an entry packs, from the lowest bit on: the score (32 bits), the depth (8 bits),
+    the bound type (2 bits), the best move (13 bits) and the search generation (8 bits).
+    The key of an entry is stored xor the data, so that an entry half written by another process sharing the table
+    doesn't match any position.
+    """
+
+    def __init__(self, sizeMB=16, buffer=None):
+        """
+        :param sizeMB: the memory the table may use in megabytes. The number of buckets is rounded down to a power of
+        two, so the table never exceeds this size.
+        :param buffer: a writable buffer of at least tableBytes(sizeMB) bytes to keep the entries in, e.g. the buffer
+        of a multiprocessing.shared_memory.SharedMemory to share the table between processes. The table is allocated
+        if None.
+        """
+        entries = tableBytes(sizeMB) // ENTRY_BYTES
+        self.mask = entries // 2 - 1
+        if buffer is None:
+            self.views = []
+            self.keys = array('Q', bytes(entries * 8))
+            self.data = array('Q', bytes(entries * 8))
+        else:
+            words = memoryview(buffer).cast('B')[:entries * ENTRY_BYTES].cast('Q')
+            self.views = [words]
+            self.keys = words[:entries]
+            self.data = words[entries:]
+            self.views += [self.keys, self.data]
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0  # probes that found the bucket occupied by other positions
+        self.stores = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def sizeInBytes(self):
+        return len(self.keys) * ENTRY_BYTES
+
+    def newSearch(self):
+        """
+        Should be called before every search, so that entries of former searches are replaced first.
+        """
+        self.generation = (self.generation + 1) & 0xFF
+
+    def clear(self):
+        empty = array('Q', bytes(len(self.keys) * 8))
+        self.keys[:] = empty
+        self.data[:] = empty
+        self.generation = self.hits = self.misses = self.collisions = self.stores = 0
+
+    def release(self):
+        """
+        Releases the views of the buffer the table was created with, so that the buffer can be closed. The table can't
+        be used afterwards.
+        """
+        for view in reversed(self.views):
+            view.release()
+        self.views = []
+
+    def probe(self, positionHash):
+        """
+        :return: the tuple (depth, score, bound, bestMove) stored for the position, where bestMove is a packed move,
+        or None if the position is not in the table
+        :rtype: tuple
+        """
+        slot = (positionHash & self.mask) << 1
+        keys = self.keys
+        data = self.data[slot]
+        if keys[slot] ^ data != positionHash:
+            slot += 1
+            data = self.data[slot]
+            if keys[slot] ^ data != positionHash:
+                self.misses += 1
+                if keys[slot] or keys[slot - 1]:
+                    self.collisions += 1
+                return None
+        self.hits += 1
+        return ((data >> 32) & 0xFF, (data & 0xFFFFFFFF) - SCORE_OFFSET, (data >> 40) & 0x3,
+                (data >> 42) & 0x1FFF)
+
+    def store(self, positionHash, depth, score, bound, bestMove=None):
+        """
+        Stores the result of searching a position.
+        :param bestMove: the best move found, a ChessEngine.Move, or None
+        """
+        depth = min(max(depth, 0), 0xFF)
+        slot = (positionHash & self.mask) << 1
+        data = self.data[slot]
+        if self.keys[slot] ^ data != positionHash and depth < (data >> 32) & 0xFF and data >> 55 == self.generation:
+            # the depth preferred entry holds a deeper search of this generation, use the always replace entry
+            slot += 1
+            data = self.data[slot]
+        packedMove = packMove(bestMove)
+        if packedMove == 0 and self.keys[slot] ^ data == positionHash:
+            # keep the best move known for the position
+            packedMove = (data >> 42) & 0x1FFF
+        data = ((score + SCORE_OFFSET) | depth << 32 | bound << 40 | packedMove << 42 | self.generation << 55)
+        self.keys[slot] = positionHash ^ data
+        self.data[slot] = data
+        self.stores += 1
+
+    def hitRate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
@@ -0,0 +1,292 @@
+"""
+Texel tuning of the evaluation: fits the piece values and the piece-square tables of GameState.evaluate to a file
+of positions labelled with the result of the game they were played in, by minimising the squared error between the
+results and the sigmoid of the evaluation. The evaluation is linear in its parameters, so the error and its gradient
+are computed for a whole chunk of positions with a few NumPy operations on its sparse feature matrix. The file is
+read in chunks, so it never has to fit in memory, and the chunks are spread over a pool of worker processes.
+Each line of the file holds a position in Forsyth-Edwards Notation (only the fields up to the player to move are
+needed) and the result from the point of view of white, separated by a semicolon, e.g.
+    rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1;1-0
+where the result may be 1-0, 1/2-1/2, 0-1 or a number from 1 (white won) to 0 (black won).
+Run it from the repository root, e.g.
+    python -m src.Tuning positions.txt --epochs 20 --output tuned.json
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+import numpy as np
+
+from .ChessEngine import (MIDDLEGAME_VALUES, ENDGAME_VALUES, MIDDLEGAME_TABLES, ENDGAME_TABLES,
+                          PHASE_WEIGHTS, MAX_PHASE)
+
+PIECE_TYPES = "pNBRQK"
+RESULTS = {"1-0": 1.0, "1/2-1/2": 0.5, "0-1": 0.0}
+# the parameters, in this order: the middlegame and the endgame values of the piece types, then the middlegame and
+# the endgame tables of the piece types, 64 entries each
+VALUES = len(PIECE_TYPES)
+TABLE_OFFSET = 2 * VALUES
+PARAMETERS = TABLE_OFFSET + 2 * VALUES * 64
+CHUNK_SIZE = 20000
+
+
+def initialParameters():
+    """
+    :return: the parameters of the current evaluation
+    :rtype: np.ndarray
+    """
+    values = [MIDDLEGAME_VALUES[pieceType] for pieceType in PIECE_TYPES]
+    values += [ENDGAME_VALUES[pieceType] for pieceType in PIECE_TYPES]
+    tables = [entry for pieceType in PIECE_TYPES for entry in MIDDLEGAME_TABLES[pieceType]]
+    tables += [entry for pieceType in PIECE_TYPES for entry in ENDGAME_TABLES[pieceType]]
+    return np.array(values + tables, dtype=np.float64)
+
+
+def parametersToJson(parameters):
+    """
+    :return: the parameters in the form of the tables of ChessEngine, rounded to integers
+    :rtype: dict
+    """
+    parameters = [int(round(parameter)) for parameter in parameters]
+    tables = {}
+    for name, offset in (("middlegame", 0), ("endgame", VALUES)):
+        tables[name + "Values"] = dict(zip(PIECE_TYPES, parameters[offset:offset + VALUES]))
+        start = TABLE_OFFSET + offset * 64
+        tables[name + "Tables"] = {pieceType: parameters[start + number * 64:start + number * 64 + 64]
+                                   for number, pieceType in enumerate(PIECE_TYPES)}
+    return tables
+
+
+def parseLine(line):
+    """
+    :return: the tuple (pieces, result) of a line of the position file: pieces is a list of (piece, bit index), the
+    result is from the point of view of white. None for an empty line.
+    :rtype: tuple
+    """
+    line = line.strip()
+    if not line:
+        return None
+    fen, result = line.rsplit(";", 1)
+    result = result.strip()
+    result = RESULTS[result] if result in RESULTS else float(result)
+    pieces = []
+    index = 0
+    for character in fen.split()[0]:
+        if character == "/":
+            continue
+        if character.isdigit():
+            index += int(character)
+        else:
+            pieceType = 'p' if character in "pP" else character.upper()
+            pieces.append((("w" if character.isupper() else "b") + pieceType, index))
+            index += 1
+    return pieces, result
+
+
+def featureMatrix(positions):
+    """
+    The evaluation is the dot product of the features of a position with the parameters: for each piece of white the
+    features of its value and of its square count with the share of the middlegame and the endgame in the phase, for
+    each piece of black negatively on the mirrored square. A position has at most 4 features per piece, so the
+    matrix is returned in sparse form, as the rows, columns and values of its entries.
+    :param positions: a list of (pieces, result) as returned by parseLine
+    :return: the tuple (rows, columns, weights, results), results is an (N,) array
+    :rtype: tuple
+    """
+    results = np.array([result for pieces, result in positions], dtype=np.float64)
+    rows = np.array([row for row, (pieces, result) in enumerate(positions) for piece in pieces], dtype=np.int64)
+    pieces = [piece for pieces, result in positions for piece, index in pieces]
+    numbers = np.array([PIECE_TYPES.index(piece[1]) for piece in pieces], dtype=np.int64)
+    signs = np.array([1 if piece[0] == 'w' else -1 for piece in pieces], dtype=np.float64)
+    indices = np.array([index for pieces, result in positions for piece, index in pieces], dtype=np.int64)
+    # the tables of black are mirrored vertically
+    squares = np.where(signs > 0, indices, indices ^ 56)
+    phaseWeights = np.array([PHASE_WEIGHTS[pieceType] for pieceType in PIECE_TYPES], dtype=np.float64)
+    phases = np.minimum(np.bincount(rows, phaseWeights[numbers], minlength=len(positions)), MAX_PHASE) / MAX_PHASE
+    middlegame = phases[rows] * signs
+    endgame = (1 - phases[rows]) * signs
+    columns = np.concatenate((numbers, VALUES + numbers, TABLE_OFFSET + numbers * 64 + squares,
+                              TABLE_OFFSET + (VALUES + numbers) * 64 + squares))
+    weights = np.concatenate((middlegame, endgame, middlegame, endgame))
+    return np.tile(rows, 4), columns, weights, results
+
+
+def evaluateFeatures(rows, columns, weights, parameters, count):
+    """
+    :return: the (count,) array of the scores of the positions of a feature matrix, from the point of view of white
+    :rtype: np.ndarray
+    """
+    return np.bincount(rows, weights * parameters[columns], minlength=count)
+
+
+def sigmoid(scores, k):
+    """
+    :return: the expected result for the scores in centipawns, from 0 to 1
+    :rtype: np.ndarray
+    """
+    return 1 / (1 + np.power(10.0, -k * scores / 400))
+
+
+def chunkErrorAndGradient(lines, parameters, k):
+    """
+    Runs in a worker process.
+    :return: the tuple (errorSum, gradientSum, count) of the squared errors of the positions of the lines
+    :rtype: tuple
+    """
+    positions = [position for position in map(parseLine, lines) if position is not None]
+    rows, columns, weights, results = featureMatrix(positions)
+    expected = sigmoid(evaluateFeatures(rows, columns, weights, parameters, len(positions)), k)
+    difference = expected - results
+    # the derivative of the squared error by the score of each position
+    slope = 2 * difference * expected * (1 - expected) * k * math.log(10) / 400
+    gradient = np.bincount(columns, weights * slope[rows], minlength=PARAMETERS)
+    return float(difference @ difference), gradient, len(positions)
+
+
+def readChunks(path, chunkSize=CHUNK_SIZE):
+    """
+    Yields the lines of the file in lists of chunkSize lines.
+    """
+    with open(path) as file:
+        while True:
+            lines = list(islice(file, chunkSize))
+            if not lines:
+                return
+            yield lines
+
+
+class Tuner:
+    """
+    Gradient descent with the Adam update rule over the mean squared error of all the positions of a file.
+    """
+
+    def __init__(self, path, workers=None, chunkSize=CHUNK_SIZE, k=1.0, learningRate=1.0):
+        """
+        :param workers: the number of worker processes, one per CPU core if None, no pool if 1
+        :param k: the scaling constant of the sigmoid, see fitScalingConstant
+        """
+        self.path = path
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.chunkSize = chunkSize
+        self.k = k
+        self.learningRate = learningRate
+        self.parameters = initialParameters()
+        self.pool = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            self.pool = Pool(self.workers)
+        return self
+
+    def __exit__(self, *exception):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def errorAndGradient(self, parameters=None, k=None):
+        """
+        :return: the tuple (meanError, gradient of the mean error) over all the positions of the file
+        :rtype: tuple
+        """
+        parameters = self.parameters if parameters is None else parameters
+        k = self.k if k is None else k
+        errorSum, gradientSum, count = 0.0, np.zeros(PARAMETERS), 0
+        for chunkError, chunkGradient, chunkCount in self.mapChunks(parameters, k):
+            errorSum += chunkError
+            gradientSum += chunkGradient
+            count += chunkCount
+        if not count:
+            raise ValueError("no positions in " + self.path)
+        return errorSum / count, gradientSum / count
+
+    def mapChunks(self, parameters, k):
+        """
+        Yields the results of chunkErrorAndGradient for the chunks of the file. With a pool, only two chunks per
+        worker are read ahead, so the memory used doesn't grow with the size of the file.
+        """
+        chunks = readChunks(self.path, self.chunkSize)
+        if self.pool is None:
+            for lines in chunks:
+                yield chunkErrorAndGradient(lines, parameters, k)
+            return
+        pending = deque()
+        for lines in chunks:
+            pending.append(self.pool.apply_async(chunkErrorAndGradient, (lines, parameters, k)))
+            if len(pending) >= 2 * self.workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    def fitScalingConstant(self, candidates=np.linspace(0.5, 2.0, 16)):
+        """
+        Chooses the scaling constant of the sigmoid that fits the current parameters best, before tuning them.
+        :return: the scaling constant
+        :rtype: float
+        """
+        errors = [self.errorAndGradient(k=k)[0] for k in candidates]
+        self.k = float(candidates[int(np.argmin(errors))])
+        return self.k
+
+    def tune(self, epochs, info=None):
+        """
+        :param info: an optional function called with (epoch, error) after each epoch
+        :return: the mean error of the parameters before the last update
+        :rtype: float
+        """
+        beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+        momentum = np.zeros(PARAMETERS)
+        velocity = np.zeros(PARAMETERS)
+        error = None
+        for epoch in range(1, epochs + 1):
+            error, gradient = self.errorAndGradient()
+            momentum = beta1 * momentum + (1 - beta1) * gradient
+            velocity = beta2 * velocity + (1 - beta2) * gradient * gradient
+            step = momentum / (1 - beta1 ** epoch) / (np.sqrt(velocity / (1 - beta2 ** epoch)) + epsilon)
+            self.parameters -= self.learningRate * step
+            if info is not None:
+                info(epoch, error)
+        return error
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Tune the evaluation parameters on a file of labelled positions.")
+    parser.add_argument("path", help="the file of positions, one 'FEN;result' per line")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=0, help="the number of worker processes, 0 for one per core")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="the number of lines read at once")
+    parser.add_argument("--learning-rate", type=float, default=1.0)
+    parser.add_argument("--k", type=float, help="the scaling constant of the sigmoid, fitted if omitted")
+    parser.add_argument("--output", help="the JSON file to write the tuned parameters to")
+    args = parser.parse_args(args)
+
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+    with Tuner(args.path, workers, args.chunk_size, learningRate=args.learning_rate) as tuner:
+        start = time.perf_counter()
+        if args.k is None:
+            print(f"fitted scaling constant k = {tuner.fitScalingConstant():.2f}")
+        else:
+            tuner.k = args.k
+
+        def info(epoch, error):
+            print(f"epoch {epoch:>4} error {error:.6f} time {time.perf_counter() - start:8.1f}s")
+
+        tuner.tune(args.epochs, info)
+        print(f"final error {tuner.errorAndGradient()[0]:.6f}")
+    tables = parametersToJson(tuner.parameters)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(tables, file, indent=1)
+    else:
+        print(json.dumps(tables["middlegameValues"]), json.dumps(tables["endgameValues"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
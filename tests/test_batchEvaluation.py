@@ -0,0 +1,40 @@
+import unittest
+from src.ChessEngine import START_FEN, GameState
+
+try:
+    import numpy as np
+    from src.BatchEvaluation import (PIECE_CODES, boardsToArray, bitboardsToPlanes, codesToPlanes, evaluateBatch,
+                                     evaluateCodes, gameStatesToArray, mobility, randomGameStates)
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestBatchEvaluation(unittest.TestCase):
+
+    def setUp(self):
+        self.gameStates = randomGameStates(50, seed=1)
+
+    def test_conversion(self):
+        gs = GameState()
+        gs.setFen(START_FEN)
+        codes = boardsToArray([gs.board])
+        self.assertEqual((1, 64), codes.shape)
+        self.assertEqual([PIECE_CODES[piece] for piece in gs.squares], list(codes[0]))
+        codes, whiteToMove = gameStatesToArray(self.gameStates)
+        self.assertEqual([[PIECE_CODES[piece] for piece in gs.squares] for gs in self.gameStates], codes.tolist())
+        self.assertEqual([gs.whiteToMove for gs in self.gameStates], whiteToMove.tolist())
+        # the planes unpacked from the bitboards are the same as those from the codes
+        self.assertTrue(np.array_equal(codesToPlanes(codes), bitboardsToPlanes(self.gameStates)))
+
+    def test_evaluateBatch(self):
+        self.assertEqual([gs.evaluate() for gs in self.gameStates],
+                         evaluateBatch(self.gameStates, withMobility=False).tolist())
+
+    def test_mobility(self):
+        gs = GameState()
+        # a knight in the corner reaches 2 squares, one of them occupied by a white pawn, a bishop in the center 13
+        gs.setFen("4k3/8/8/3b4/8/8/2P5/N3K3 w - - 0 1")
+        codes, whiteToMove = gameStatesToArray([gs])
+        self.assertEqual([4 * 1 - 3 * 13], mobility(codesToPlanes(codes)).tolist())
+        self.assertEqual(evaluateCodes(codes, withMobility=False) + 4 - 39, evaluateCodes(codes))
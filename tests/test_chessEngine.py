@@ -1,5 +1,6 @@
+import random
 import unittest
-from src.ChessEngine import GameState, Move
+from src.ChessEngine import GameState, Move, MoveCache, CHECKPOINT_INTERVAL, START_FEN, UNDO_CACHE_PLIES
 
 
 class TestChessEngine(unittest.TestCase):
@@ -333,6 +334,419 @@ class TestChessEngine(unittest.TestCase):
         self.assertIn(blackRightRookCastling, self.gs.validMoves)
         self.assertNotIn(blackLeftRookCastling, self.gs.validMoves)
 
+    def test_zobristHash(self):
+        self.gs.setBoard([
+            ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
+            ["bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"],
+            ["--", "--", "--", "--", "--", "--", "--", "--"],
+            ["--", "--", "--", "--", "--", "--", "--", "--"],
+            ["--", "--", "--", "--", "--", "--", "--", "--"],
+            ["--", "--", "--", "--", "--", "--", "--", "--"],
+            ["wp", "wp", "wp", "wp", "wp", "wp", "wp", "wp"],
+            ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]
+        ])
+        startHash = self.gs.hash
+        self.assertEqual(startHash, self.gs.calculateHash())
+
+        # the hash is updated incrementally and restored by undoing the moves
+        for fromSq, toSq in (((6, 7), (5, 5)), ((6, 0), (5, 2)), ((4, 6), (4, 4)), ((3, 1), (3, 3))):
+            self.gs.makeMove(Move(fromSq, toSq, self.gs))
+            self.assertEqual(self.gs.hash, self.gs.calculateHash())
+        for _ in range(4):
+            self.gs.undoMove()
+            self.assertEqual(self.gs.hash, self.gs.calculateHash())
+        self.assertEqual(startHash, self.gs.hash)
+
+        # the knights moving out and back give the start position again
+        for fromSq, toSq in (((6, 7), (5, 5)), ((6, 0), (5, 2)), ((5, 5), (6, 7)), ((5, 2), (6, 0))):
+            self.gs.makeMove(Move(fromSq, toSq, self.gs))
+        self.assertEqual(startHash, self.gs.hash)
+
+        # after a two step advance the e.p. square is part of the hash
+        self.gs.makeMove(Move((4, 6), (4, 4), self.gs))
+        epHash = self.gs.hash
+        for fromSq, toSq in (((6, 0), (5, 2)), ((6, 7), (5, 5)), ((5, 2), (6, 0)), ((5, 5), (6, 7))):
+            self.gs.makeMove(Move(fromSq, toSq, self.gs))
+        self.assertNotEqual(epHash, self.gs.hash)
+        self.assertEqual(self.gs.hash, self.gs.calculateHash())
+
+        # so is the player at turn
+        self.gs.setWhiteToMove(True)
+        self.assertEqual(self.gs.hash, self.gs.calculateHash())
+        self.gs.setWhiteToMove(False)
+
+        # moving the king changes the castling rights and thus the hash
+        for fromSq, toSq in (((4, 1), (4, 3)), ((6, 7), (5, 5)), ((4, 0), (4, 1)), ((5, 5), (6, 7)), ((4, 1), (4, 0))):
+            self.gs.makeMove(Move(fromSq, toSq, self.gs))
+        self.assertTrue(self.gs.piecesMoved["bK"])
+        self.assertEqual(self.gs.hash, self.gs.calculateHash())
+
+    def test_undoMove(self):
+        self.gs.setFen("r3k3/1P6/8/2pP4/8/8/8/R3K2R w KQq c6 0 1")
+        board = [row[:] for row in self.gs.board]
+        state = (self.gs.whiteToMove, self.gs.enPassantSquare, dict(self.gs.piecesMoved), self.gs.hash)
+        validMoves = self.gs.validMoves
+        # promotion with capture, en passant and castling are taken back without recalculating the moves
+        for fromSq, toSq in (((1, 1), (0, 0)), ((3, 3), (2, 2)), ((4, 7), (6, 7))):
+            self.assertIn((fromSq, toSq), self.gs.validMoves)
+            self.gs.makeMove(self.gs.validMoves[self.gs.validMoves.index((fromSq, toSq))])
+            self.assertNotEqual(board, self.gs.board)
+            self.gs.undoMove()
+            self.assertEqual(board, self.gs.board)
+            self.assertEqual(state, (self.gs.whiteToMove, self.gs.enPassantSquare, self.gs.piecesMoved, self.gs.hash))
+            self.assertIs(validMoves, self.gs.validMoves)
+
+    def test_lazyMoves(self):
+        self.gs.setFen("r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4")
+        mate = Move((7, 3), (5, 1), self.gs)
+        self.gs.makeMove(mate)  # Qxf7#
+        # making a move doesn't calculate the moves of the new position
+        self.assertIsNone(self.gs._validMoves)
+        self.assertIsNone(self.gs._possibleMoves)
+        self.assertTrue(self.gs.isCheckmate())
+        self.assertFalse(self.gs.isStalemate())
+        self.assertEqual([], list(self.gs.generateValidMoves()))
+        self.assertEqual([], self.gs.validMoves)
+
+        self.gs.undoMove()
+        self.assertFalse(self.gs.isCheckmate())
+        self.assertTrue(self.gs.hasValidMove())
+        generatedMoves = list(self.gs.generateValidMoves())
+        self.assertIsNone(self.gs._validMoves)
+        self.assertEqual(sorted((move.fromSq, move.toSq) for move in self.gs.validMoves),
+                         sorted((move.fromSq, move.toSq) for move in generatedMoves))
+        self.assertIn(mate, self.gs.validMoves)
+
+    def test_captureMoves(self):
+        # kiwipete with a white pawn on b7 that can take or be promoted, and en passant possible after a2a4
+        self.gs.setFen("r3k2r/pPppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        self.gs.makeMove(Move((0, 6), (0, 4), self.gs))
+        captures = self.gs.calculateCaptureMoves()
+        self.assertIsNone(self.gs._validMoves)
+        expected = [move for move in self.gs.validMoves if move.isCapture() or move.isPromotion()]
+        self.assertEqual(sorted((move.fromIndex, move.toIndex) for move in expected),
+                         sorted((move.fromIndex, move.toIndex) for move in captures))
+        self.assertIn(((1, 4), (0, 5)), captures)  # b4xa3 e.p.
+
+    def test_incrementalEvaluation(self):
+        self.gs.setFen(START_FEN)
+        self.assertEqual(0, self.gs.evaluate())
+        self.assertEqual(24, self.gs.phase)
+        # an en passant capture, a castling move and a promotion
+        self.gs.setFen("r3k3/1P6/8/2pP4/8/8/8/R3K2R w KQq c6 0 1")
+        terms = self.gs.calculateEvaluationTerms()
+        for fromSq, toSq in (((3, 3), (2, 2)), ((4, 0), (3, 0)), ((4, 7), (6, 7)), ((3, 0), (4, 0)),
+                             ((1, 1), (0, 0))):
+            move = [move for move in self.gs.validMoves if move == (fromSq, toSq)][0]
+            self.gs.makeMove(move)
+            self.assertEqual(self.gs.calculateEvaluationTerms(),
+                             (self.gs.middlegameScore, self.gs.endgameScore, self.gs.phase))
+        self.assertEqual("wQ", self.gs.board[0][0])
+        # white is a rook and a queen up, and it's black to move
+        self.assertLess(self.gs.evaluate(), -1400)
+        for _ in range(5):
+            self.gs.undoMove()
+        self.assertEqual(terms, (self.gs.middlegameScore, self.gs.endgameScore, self.gs.phase))
+
+    def test_nullMove(self):
+        self.gs.setFen("rnbqkbnr/ppp1pppp/8/8/3pP3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 3")
+        positionHash = self.gs.hash
+        validMoves = self.gs.validMoves
+        self.gs.makeNullMove()
+        self.assertTrue(self.gs.whiteToMove)
+        self.assertIsNone(self.gs.enPassantSquare)
+        self.assertNotEqual(positionHash, self.gs.hash)
+        self.assertEqual(self.gs.calculateHash(), self.gs.hash)
+        self.assertTrue(all(move.pieceMoved[0] == 'w' for move in self.gs.validMoves))
+        self.gs.undoNullMove()
+        self.assertFalse(self.gs.whiteToMove)
+        self.assertEqual((4, 5), self.gs.enPassantSquare)
+        self.assertEqual(positionHash, self.gs.hash)
+        self.assertIs(validMoves, self.gs.validMoves)
+        self.assertEqual([], self.gs.moveLog)
+        # the first king or rook moves after a null move don't change the castling rights restored by undoing it
+        self.gs.setFen("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+        positionHash = self.gs.hash
+        self.gs.makeNullMove()
+        self.gs.makeMove(Move((4, 0), (4, 1), self.gs))
+        self.gs.makeMove(Move((7, 7), (7, 6), self.gs))
+        self.gs.undoMove()
+        self.gs.undoMove()
+        self.gs.undoNullMove()
+        self.assertFalse(any(self.gs.piecesMoved.values()))
+        self.assertEqual(positionHash, self.gs.hash)
+        self.assertEqual(self.gs.calculateHash(), self.gs.hash)
+
+    def test_staticExchangeEvaluation(self):
+        def see(fen, fromSq, toSq):
+            self.gs.setFen(fen)
+            return self.gs.staticExchangeEvaluation(Move(fromSq, toSq, self.gs))
+
+        # the rook wins the undefended pawn
+        self.assertEqual(100, see("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1", (4, 7), (4, 3)))
+        # the knight takes a pawn defended twice, with rook and queen behind the defenders x-raying through them
+        self.assertEqual(-220, see("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", (3, 5), (4, 3)))
+        # the queen takes a pawn defended by a pawn
+        self.assertEqual(-800, see("4k3/8/4p3/3p4/8/8/8/3QK3 w - - 0 1", (3, 7), (3, 3)))
+        # the king can't recapture on a square that is still attacked
+        self.assertEqual(320, see("8/8/8/3k4/3n4/8/3R4/3RK3 w - - 0 1", (3, 6), (3, 4)))
+        # no moves are made
+        self.assertEqual([], self.gs.moveLog)
+
+    def test_clone(self):
+        self.gs.setFen(START_FEN)
+        for fromSq, toSq in (((4, 6), (4, 4)), ((2, 1), (2, 3)), ((4, 4), (4, 3)), ((3, 1), (3, 3))):
+            self.gs.makeMove(Move(fromSq, toSq, self.gs))
+        clone = self.gs.clone()
+        self.assertEqual(self.gs.board, clone.board)
+        self.assertEqual((self.gs.hash, self.gs.pawnHash, self.gs.evaluate()),
+                         (clone.hash, clone.pawnHash, clone.evaluate()))
+        self.assertEqual((3, 2), clone.enPassantSquare)
+        self.assertEqual([], clone.moveLog)
+        self.assertEqual(len(self.gs.validMoves), len(clone.validMoves))
+
+        # the clone and the original change independently
+        enPassant = next(move for move in clone.validMoves if move.enPassant)
+        clone.makeMove(enPassant)
+        self.assertEqual("--", clone.board[3][3])
+        self.assertEqual("bp", self.gs.board[3][3])
+        self.assertEqual(self.gs.calculateHash(), self.gs.hash)
+        self.assertEqual(clone.calculateHash(), clone.hash)
+        self.assertEqual(clone.calculateEvaluationTerms(), (clone.middlegameScore, clone.endgameScore, clone.phase))
+        self.assertNotEqual(self.gs.bitboards, clone.bitboards)
+
+        # with history the moves made before can be undone on the clone
+        clone = self.gs.clone(keepHistory=True)
+        self.assertEqual(4, len(clone.moveLog))
+        for move in range(4):
+            clone.undoMove()
+        self.assertEqual(4, len(self.gs.moveLog))
+        start = GameState()
+        start.setFen(START_FEN)
+        self.assertEqual(start.board, clone.board)
+        self.assertEqual(start.hash, clone.hash)
+
+    def test_moveHistory(self):
+        # a game of random moves, preferring promotions, captures e.p. and castling whenever there are any
+        rng = random.Random(7)
+        self.gs.setFen("r3k2r/pPppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PpPBBPPP/R3K2R w KQkq - 0 1")
+        boards = []
+        while len(boards) < 3 * CHECKPOINT_INTERVAL + 5 and self.gs.validMoves:
+            boards.append([row[:] for row in self.gs.board])
+            special = [move for move in self.gs.validMoves
+                       if move.enPassant or move.castling or move.pieceMoved[1] == 'p' and move.toRow in (0, 7)]
+            self.gs.makeMove(rng.choice(special or self.gs.validMoves))
+        self.assertTrue(any(move.enPassant for move in self.gs.moveLog))
+        self.assertTrue(any(move.castling for move in self.gs.moveLog))
+        self.assertEqual(len(boards) // CHECKPOINT_INTERVAL + 1, len(self.gs.checkpoints))
+        for moveIndex, board in enumerate(boards):
+            self.assertEqual(board, self.gs.getBoardBeforeMove(moveIndex))
+        self.assertEqual(self.gs.board, self.gs.getBoardBeforeMove(len(boards)))
+
+        # only the last moves keep the move lists of their position on the undo stack
+        self.assertTrue(all(entry[4] is None for entry in self.gs.undoStack[:-UNDO_CACHE_PLIES]))
+        # the older moves can still be undone, their moves are calculated again
+        validMoves = []
+        while self.gs.moveLog:
+            self.gs.undoMove()
+            validMoves.append(len(self.gs.validMoves))
+        self.assertEqual(boards[0], self.gs.board)
+        self.assertEqual(self.gs.calculateHash(), self.gs.hash)
+        self.assertEqual(48, validMoves[-1])
+
+        # without a checkpoint, e.g. when the log starts with a null move, the moves are taken back
+        self.gs.setFen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        board = [row[:] for row in self.gs.board]
+        self.gs.makeNullMove()
+        self.gs.makeMove(self.gs.validMoves[0])
+        self.assertEqual([], self.gs.checkpoints)
+        self.assertEqual(board, self.gs.getBoardBeforeMove(0))
+        self.assertEqual(board, self.gs.getBoardBeforeMove(1))
+
+    def test_moveCache(self):
+        fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+        self.gs.setFen(fen)
+        expected = [(move.fromIndex, move.toIndex, move.flags, move.pieceCaptured) for move in self.gs.validMoves]
+        self.gs.moveCache = MoveCache(capacity=2)
+        self.gs.setFen(fen)
+        self.gs.validMoves
+        self.assertEqual((0, 1), (self.gs.moveCache.hits, self.gs.moveCache.misses))
+
+        # the same position again: the moves, with castling, are rebuilt from the cache
+        self.gs.setFen(fen)
+        moves = self.gs.validMoves
+        self.assertEqual(expected, [(move.fromIndex, move.toIndex, move.flags, move.pieceCaptured) for move in moves])
+        self.assertEqual(2, sum(move.castling for move in moves))
+        self.assertEqual((1, 1), (self.gs.moveCache.hits, self.gs.moveCache.misses))
+
+        # a capture e.p. keeps its flag, the e.p. square is part of the key
+        self.gs.makeMove(Move((0, 6), (0, 4), self.gs))
+        self.assertEqual(1, sum(move.enPassant for move in self.gs.validMoves))
+        self.gs.undoMove()
+        self.gs.makeMove(Move((0, 6), (0, 5), self.gs))
+        self.assertEqual(0, sum(move.enPassant for move in self.gs.validMoves))
+        self.assertEqual((1, 3), (self.gs.moveCache.hits, self.gs.moveCache.misses))
+
+        # the position used least recently was evicted
+        self.assertEqual(2, len(self.gs.moveCache))
+        self.assertEqual(1, self.gs.moveCache.evictions)
+        self.gs.setFen(fen)
+        self.gs.validMoves
+        self.assertEqual((1, 4), (self.gs.moveCache.hits, self.gs.moveCache.misses))
+
+    def test_draws(self):
+        # the knights move back and forth, the position occurs again every four moves
+        self.gs.setFen(START_FEN)
+        shuffle = (((6, 7), (5, 5)), ((6, 0), (5, 2)), ((5, 5), (6, 7)), ((5, 2), (6, 0)))
+        for repetition in range(2):
+            self.assertFalse(self.gs.isThreefoldRepetition())
+            for fromSq, toSq in shuffle:
+                self.gs.makeMove(Move(fromSq, toSq, self.gs))
+            self.assertTrue(self.gs.isRepetition())
+        self.assertEqual(8, self.gs.halfmoveClock)
+        self.assertTrue(self.gs.isThreefoldRepetition())
+        self.assertTrue(self.gs.isDraw())
+        self.gs.undoMove()
+        self.assertEqual(7, self.gs.halfmoveClock)
+        self.assertFalse(self.gs.isThreefoldRepetition())
+        # a pawn move can't be taken back, the positions before it don't count
+        self.gs.makeMove(Move((3, 1), (3, 3), self.gs))
+        self.assertEqual(0, self.gs.halfmoveClock)
+        self.assertFalse(self.gs.isRepetition())
+        # the position after a null move is not a repetition of the one before it
+        self.gs.makeNullMove()
+        self.gs.makeNullMove()
+        self.assertFalse(self.gs.isRepetition())
+        self.gs.undoNullMove()
+        self.gs.undoNullMove()
+        self.assertEqual(0, self.gs.halfmoveClock)
+        # the positions before the history is cleared, e.g. when a game is loaded, don't count
+        self.gs.setFen(START_FEN)
+        for fromSq, toSq in shuffle:
+            self.gs.makeMove(Move(fromSq, toSq, self.gs))
+        self.assertTrue(self.gs.isRepetition())
+        self.gs.clearHistory()
+        self.assertFalse(self.gs.isRepetition())
+        self.assertEqual([], self.gs.moveLog)
+
+        # the fifty-move rule, the clock is read from the FEN
+        self.gs.setFen("4k3/8/8/8/8/8/4P3/R3K3 w - - 99 80")
+        self.assertFalse(self.gs.isDraw())
+        self.gs.makeMove(Move((0, 7), (0, 6), self.gs))
+        self.assertTrue(self.gs.isFiftyMoveRule())
+        self.assertTrue(self.gs.isDraw())
+        self.gs.undoMove()
+        self.gs.makeMove(Move((4, 6), (4, 4), self.gs))
+        self.assertFalse(self.gs.isFiftyMoveRule())
+
+    def test_insufficientMaterial(self):
+        for fen, insufficient in (("4k3/8/8/8/8/8/8/4K3 w - - 0 1", True),
+                                  ("4k3/8/8/8/8/8/8/2N1K3 w - - 0 1", True),
+                                  ("4k3/8/8/8/8/8/8/2B1K3 w - - 0 1", True),
+                                  ("2b1k3/8/8/8/8/8/8/2B1K3 w - - 0 1", False),  # bishops on different colors
+                                  ("2b1k3/8/8/8/8/8/8/3BK3 w - - 0 1", True),
+                                  ("4k3/8/8/8/8/8/8/1NN1K3 w - - 0 1", False),
+                                  ("4k3/8/8/8/8/8/8/3RK3 w - - 0 1", False),
+                                  ("4k3/8/8/8/8/8/7p/4K3 w - - 0 1", False)):
+            with self.subTest(fen=fen):
+                self.gs.setFen(fen)
+                self.assertEqual(insufficient, self.gs.isInsufficientMaterial())
+        # a capture that leaves only the kings
+        self.gs.setFen("4k3/8/8/8/8/8/3r4/4K3 w - - 0 1")
+        self.assertFalse(self.gs.isInsufficientMaterial())
+        self.gs.makeMove(Move((4, 7), (3, 6), self.gs))
+        self.assertTrue(self.gs.isInsufficientMaterial())
+
+    def test_legalMoves(self):
+        def moves(fen):
+            self.gs.setFen(fen)
+            return sorted((move.fromSq, move.toSq) for move in self.gs.validMoves)
+
+        # a pinned rook and a pinned bishop may only move along the line of the pin, up to the pinning piece
+        self.assertEqual([((3, 6), (0, 3)), ((3, 6), (1, 4)), ((3, 6), (2, 5)),
+                          ((4, 6), (4, 0)), ((4, 6), (4, 1)), ((4, 6), (4, 2)), ((4, 6), (4, 3)), ((4, 6), (4, 4)),
+                          ((4, 6), (4, 5)), ((4, 7), (3, 7)), ((4, 7), (5, 6)), ((4, 7), (5, 7))],
+                         moves("4r1k1/8/8/b7/8/8/3BR3/4K3 w - - 0 1"))
+        # in a double check only the king can move, the rook can't take the knight
+        self.assertEqual([((4, 0), (3, 0)), ((4, 0), (5, 0)), ((4, 0), (5, 1))],
+                         moves("4k3/8/r4N2/8/8/8/8/4R1K1 b - - 0 1"))
+        # a check by a slider can be evaded by taking the checking piece or by blocking the line
+        self.assertEqual([((0, 3), (4, 3)), ((2, 1), (4, 0)), ((2, 1), (4, 2)),
+                          ((4, 7), (3, 6)), ((4, 7), (3, 7)), ((4, 7), (5, 6)), ((4, 7), (5, 7))],
+                         moves("4r2k/2N5/8/R7/8/8/8/4K3 w - - 0 1"))
+        # taking en passant removes both pawns from the row of the king
+        self.assertIn(((1, 3), (2, 2)), moves("4k3/8/8/KPp5/8/8/8/8 w - c6 0 2"))
+        self.assertEqual([((0, 3), (0, 2)), ((0, 3), (0, 4)), ((0, 3), (1, 2)), ((1, 3), (1, 2))],
+                         moves("4k3/8/8/KPp4r/8/8/8/8 w - c6 0 2"))
+
+    def test_bitboards(self):
+        def assertConsistent():
+            for piece, bitboard in self.gs.bitboards.items():
+                self.assertEqual(sum(1 << index for index, square in enumerate(self.gs.squares) if square == piece),
+                                 bitboard)
+            for color in "wb":
+                self.assertEqual(sum(bitboard for piece, bitboard in self.gs.bitboards.items() if piece[0] == color),
+                                 self.gs.colorBitboards[color])
+            self.assertEqual([piece for row in self.gs.board for piece in row], self.gs.squares)
+
+        # kiwipete, where castling, en passant and promotions come up quickly
+        self.gs.setFen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        bitboards = dict(self.gs.bitboards)
+        assertConsistent()
+        rng = random.Random(7)
+        for _ in range(40):
+            if not self.gs.validMoves:
+                break
+            self.gs.makeMove(rng.choice(self.gs.validMoves))
+            assertConsistent()
+        while self.gs.moveLog:
+            self.gs.undoMove()
+            assertConsistent()
+        self.assertEqual(bitboards, self.gs.bitboards)
+
+    def test_compactMove(self):
+        self.gs.setFen("r3k3/1P6/8/2pP4/8/8/8/R3K2R w KQq c6 0 1")
+        move = Move((4, 7), (5, 7), self.gs)
+        # the move keeps no dictionary and no copy of the board
+        self.assertFalse(hasattr(move, "__dict__"))
+        self.assertEqual(((4, 7), (5, 7)), (move.fromSq, move.toSq))
+        self.assertEqual((4, 7, 5, 7), (move.fromCol, move.fromRow, move.toCol, move.toRow))
+        self.assertEqual((60, 61), (move.fromIndex, move.toIndex))
+        self.assertEqual(("wK", "--"), (move.pieceMoved, move.pieceCaptured))
+        self.assertEqual((2, 2), move.enPassantSquare)
+        self.assertEqual("wK", move.firstMoveOf)
+        self.assertEqual(move, ((4, 7), (5, 7)))
+        self.assertEqual(move, Move((4, 7), (5, 7), self.gs))
+        self.assertNotEqual(move, Move((4, 7), (3, 7), self.gs))
+        self.assertFalse(move.enPassant or move.castling or move.isCapture() or move.isPromotion())
+
+        enPassant = [move for move in self.gs.validMoves if move == ((3, 3), (2, 2))][0]
+        self.assertTrue(enPassant.enPassant and enPassant.isCapture())
+        self.assertFalse(enPassant.castling)
+        castling = [move for move in self.gs.validMoves if move == ((4, 7), (6, 7))][0]
+        self.assertTrue(castling.castling)
+        self.assertFalse(castling.enPassant)
+        promotion = [move for move in self.gs.validMoves if move == ((1, 1), (0, 0))][0]
+        self.assertTrue(promotion.isPromotion() and promotion.isCapture())
+        # only the first move of a rook or king changes the castling rights
+        self.gs.makeMove(Move((7, 7), (6, 7), self.gs))
+        self.gs.makeMove(Move((4, 0), (3, 0), self.gs))
+        self.assertIsNone(Move((6, 7), (7, 7), self.gs).firstMoveOf)
+        self.assertEqual("wLR", Move((0, 7), (1, 7), self.gs).firstMoveOf)
+
+    def test_isAttackedBy(self):
+        # the lookup from the square outwards agrees with the attacks of all the pieces, on every square
+        for fen in (START_FEN,
+                    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"):
+            self.gs.setFen(fen)
+            occupied = self.gs.colorBitboards["w"] | self.gs.colorBitboards["b"]
+            for color in "wb":
+                attacked = self.gs.attackedSquares(color, occupied)
+                with self.subTest(fen=fen, color=color):
+                    self.assertEqual([attacked >> index & 1 == 1 for index in range(64)],
+                                     [self.gs.isAttackedBy(index, color) for index in range(64)])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,86 @@
+import unittest
+from src.ChessEngine import gameStateFromFen, moveToCoordinates
+from src.ChessSearch import Search, SearchConfig, MATE_SCORE, benchmark, benchmarkConfigs
+from src.TranspositionTable import TranspositionTable
+
+
+class TestChessSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.search = Search(TranspositionTable(sizeMB=1))
+
+    def test_mateInOne(self):
+        gs = gameStateFromFen("6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+        bestMove, score, principalVariation = self.search.search(gs, maxDepth=3)
+        self.assertEqual("a1a8", moveToCoordinates(bestMove))
+        self.assertEqual(MATE_SCORE - 1, score)
+        self.assertEqual([bestMove], principalVariation)
+
+    def test_winsMaterial(self):
+        # the black queen can be taken by the knight
+        gs = gameStateFromFen("4k3/8/8/3q4/8/4N3/P7/4K3 w - - 0 1")
+        bestMove, score, principalVariation = self.search.search(gs, maxDepth=3)
+        self.assertEqual("e3d5", moveToCoordinates(bestMove))
+        self.assertGreater(score, 0)
+        # without the pawn the knight can't win, the capture only saves the draw
+        gs = gameStateFromFen("4k3/8/8/3q4/8/4N3/8/4K3 w - - 0 1")
+        bestMove, score, principalVariation = self.search.search(gs, maxDepth=3)
+        self.assertEqual("e3d5", moveToCoordinates(bestMove))
+        self.assertEqual(0, score)
+
+    def test_quiescence(self):
+        # the pawn on d5 is defended, taking it loses the queen
+        gs = gameStateFromFen("4k3/8/4p3/3p4/8/8/8/3QK3 w - - 0 1")
+        bestMove, score, principalVariation = Search(TranspositionTable(sizeMB=1), quiescence=False).search(gs, 1)
+        self.assertEqual("d1d5", moveToCoordinates(bestMove))
+        bestMove, score, principalVariation = self.search.search(gs, maxDepth=1)
+        self.assertNotEqual("d1d5", moveToCoordinates(bestMove))
+        self.assertGreater(score, 500)
+
+    def test_selectiveSearch(self):
+        for config in benchmarkConfigs():
+            with self.subTest(config=str(config)):
+                search = Search(TranspositionTable(sizeMB=1), config=config)
+                gs = gameStateFromFen("6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+                self.assertEqual((MATE_SCORE - 1), search.search(gs, maxDepth=4)[1])
+                gs = gameStateFromFen("4k3/8/8/3q4/8/4N3/8/4K3 w - - 0 1")
+                self.assertEqual("e3d5", moveToCoordinates(search.search(gs, maxDepth=4)[0]))
+                self.assertEqual([], gs.moveLog)
+
+    def test_benchmark(self):
+        fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+        configs = [SearchConfig(), SearchConfig(False, False, False, False)]
+        (selective, selectiveNodes, selectiveTime), (plain, plainNodes, plainTime) = \
+            benchmark(3, configs, positions=[fen], hashSizeMB=1)
+        self.assertIs(configs[0], selective)
+        self.assertLess(selectiveNodes, plainNodes)
+
+    def test_positionUnchanged(self):
+        gs = gameStateFromFen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        positionHash = gs.hash
+        board = [row[:] for row in gs.board]
+        self.search.search(gs, maxDepth=3)
+        self.assertEqual(positionHash, gs.hash)
+        self.assertEqual(board, gs.board)
+        self.assertEqual([], gs.moveLog)
+
+    def test_nodeBudget(self):
+        gs = gameStateFromFen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        positionHash = gs.hash
+        bestMove, score, principalVariation = self.search.search(gs, maxNodes=2000)
+        self.assertIn(bestMove, gs.validMoves)
+        self.assertLess(self.search.nodes, 2000 + 1024)
+        self.assertGreaterEqual(self.search.depth, 1)
+        self.assertEqual(positionHash, gs.hash)
+        self.assertEqual([], gs.moveLog)
+
+    def test_noValidMoves(self):
+        gs = gameStateFromFen("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1")
+        self.assertEqual((None, 0, []), self.search.search(gs, maxDepth=2))
+
+    def test_drawByRepetition(self):
+        # black is behind in material, but can check the white king forever
+        gs = gameStateFromFen("6k1/RR3ppp/2B5/8/7q/8/6P1/N5K1 b - - 0 1")
+        bestMove, score, principalVariation = self.search.search(gs, maxDepth=5)
+        self.assertEqual("h4e1", moveToCoordinates(bestMove))
+        self.assertEqual(0, score)
@@ -0,0 +1,51 @@
+import unittest
+from src.ChessEngine import GameState
+from src.MoveOrdering import MoveOrderer
+from src.TranspositionTable import packMove
+
+
+class TestMoveOrdering(unittest.TestCase):
+
+    def setUp(self):
+        self.gs = GameState()
+        # the white pawn on d4 can take the queen or the knight, the white queen can take the knight
+        self.gs.setFen("4k3/8/8/2q1n3/3P4/8/7Q/4K3 w - - 0 1")
+        self.orderer = MoveOrderer()
+
+    def coordinates(self, move):
+        return move.fromIndex, move.toIndex
+
+    def test_mvvLva(self):
+        moves = self.orderer.orderMoves(self.gs.validMoves, 0)
+        # pawn takes queen, pawn takes knight, queen takes knight
+        self.assertEqual(["dxc5", "dxe5", "Qxe5"], [str(move) for move in moves[:3]])
+
+    def test_ttMoveFirst(self):
+        quietMove = next(move for move in self.gs.validMoves if not move.isCapture())
+        moves = self.orderer.orderMoves(self.gs.validMoves, 0, packMove(quietMove))
+        self.assertEqual(quietMove, moves[0])
+
+    def test_killersAndHistory(self):
+        quietMoves = [move for move in self.gs.validMoves if not move.isCapture()]
+        killer = quietMoves[-1]
+        self.orderer.recordCutoff(killer, 3, 4, 5)
+        # a killer comes right after the captures on its ply
+        self.assertEqual(killer, self.orderer.orderMoves(self.gs.validMoves, 3)[3])
+        # on other plies its history puts it before the other quiet moves
+        self.assertEqual(killer, self.orderer.orderMoves(self.gs.validMoves, 2)[3])
+        self.assertEqual(16, self.orderer.history[killer.pieceMoved][killer.toIndex])
+        # captures are neither killers nor in the history
+        capture = next(move for move in self.gs.validMoves if move.isCapture())
+        self.orderer.recordCutoff(capture, 3, 4, 0)
+        self.assertNotIn(self.coordinates(capture), self.orderer.killers[3])
+
+    def test_cutoffStatistics(self):
+        move = self.gs.validMoves[0]
+        self.assertEqual(0.0, self.orderer.firstMoveCutoffRate())
+        self.orderer.recordCutoff(move, 0, 1, 0)
+        self.orderer.recordCutoff(move, 0, 1, 0)
+        self.orderer.recordCutoff(move, 0, 1, 3)
+        self.orderer.recordCutoff(move, 0, 1, 0)
+        self.assertEqual(0.75, self.orderer.firstMoveCutoffRate())
+        self.orderer.newSearch()
+        self.assertEqual(0, self.orderer.cutoffs)
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+from src.ChessEngine import START_FEN, GameState, Move
+
+try:
+    import numpy as np
+    from src.NeuralEvaluation import (Accumulator, evaluateFromScratch, loadWeights, pieceSquareNetwork,
+                                      randomNetwork, saveWeights)
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestNeuralEvaluation(unittest.TestCase):
+
+    def setUp(self):
+        self.gs = GameState()
+        self.network = randomNetwork(hidden=16, seed=3)
+        self.accumulator = Accumulator(self.network)
+
+    def test_incrementalUpdate(self):
+        # an en passant capture, a castling move and a promotion
+        self.gs.setFen("r3k3/1P6/8/2pP4/8/8/8/R3K2R w KQq c6 0 1")
+        self.accumulator.attach(self.gs)
+        start = self.accumulator.values.copy()
+        for fromSq, toSq in (((3, 3), (2, 2)), ((4, 0), (3, 0)), ((4, 7), (6, 7)), ((3, 0), (4, 0)),
+                             ((1, 1), (0, 0))):
+            move = [move for move in self.gs.validMoves if move == (fromSq, toSq)][0]
+            self.gs.makeMove(move)
+            self.assertEqual(evaluateFromScratch(self.network, self.gs), self.accumulator.evaluate(self.gs))
+        for _ in range(5):
+            self.gs.undoMove()
+        self.assertTrue(np.array_equal(start, self.accumulator.values))
+        self.accumulator.detach(self.gs)
+        self.gs.makeMove(Move((4, 7), (5, 7), self.gs))
+        self.assertTrue(np.array_equal(start, self.accumulator.values))
+
+    def test_pieceSquareNetwork(self):
+        accumulator = Accumulator(pieceSquareNetwork())
+        self.gs.setFen("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10")
+        accumulator.attach(self.gs)
+        self.assertEqual(self.gs.middlegameScore, accumulator.evaluate(self.gs))
+        self.gs.makeMove(Move((5, 5), (7, 3), self.gs))
+        self.assertEqual(-self.gs.middlegameScore, accumulator.evaluate(self.gs))
+
+    def test_saveAndLoadWeights(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "weights.npz")
+            saveWeights(self.network, path)
+            network = loadWeights(path)
+        self.gs.setFen(START_FEN)
+        self.assertEqual(evaluateFromScratch(self.network, self.gs), evaluateFromScratch(network, self.gs))
+        self.assertTrue(np.array_equal(self.network.weights1, network.weights1))
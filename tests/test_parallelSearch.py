@@ -0,0 +1,61 @@
+import unittest
+from src.ChessEngine import Move, gameStateFromFen, moveToCoordinates
+from src.ChessSearch import Search, MATE_SCORE
+import src.ParallelSearch as ParallelSearchModule
+from src.ParallelSearch import ParallelSearch, scaling
+from src.TranspositionTable import TranspositionTable, tableBytes
+
+
+class TestParallelSearch(unittest.TestCase):
+
+    def test_mateInOne(self):
+        gs = gameStateFromFen("6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+        with ParallelSearch(workers=2, sizeMB=1) as parallelSearch:
+            bestMove, score, principalVariation = parallelSearch.search(gs, maxDepth=3)
+            self.assertEqual("a1a8", moveToCoordinates(bestMove))
+            self.assertEqual(MATE_SCORE - 1, score)
+            self.assertEqual([bestMove], principalVariation)
+            # the pool and the table are kept for the next search
+            gs.makeMove(bestMove)
+            self.assertEqual((None, -MATE_SCORE, []), parallelSearch.search(gs, maxDepth=3))
+        self.assertEqual(1, len(gs.moveLog))
+
+    def test_scaling(self):
+        gs = gameStateFromFen("4k3/8/8/3q4/8/4N3/8/4K3 w - - 0 1")
+        results = scaling(gs, 3, 2, sizeMB=1)
+        self.assertEqual([1, 2], [workers for workers, seconds, nodes, speedup, efficiency in results])
+        self.assertEqual(1.0, results[0][3])
+        for workers, seconds, nodes, speedup, efficiency in results:
+            self.assertGreater(nodes, 0)
+            self.assertAlmostEqual(speedup / workers, efficiency)
+
+    def test_repetitionInHistory(self):
+        # a queen down, black can only draw by moving the knight to f6 a second time
+        gs = gameStateFromFen("4k1n1/8/8/8/8/8/8/Q3K3 b - - 0 1")
+        for fromSq, toSq in (((6, 0), (5, 2)), ((0, 7), (0, 6)), ((5, 2), (6, 0)), ((0, 6), (0, 7))):
+            gs.makeMove(Move(fromSq, toSq, gs))
+        bestMove, score, principalVariation = Search(TranspositionTable(sizeMB=1)).search(gs, maxDepth=4)
+        self.assertEqual(("g8f6", 0), (moveToCoordinates(bestMove), score))
+        with ParallelSearch(workers=2, sizeMB=1) as parallelSearch:
+            bestMove, score, principalVariation = parallelSearch.search(gs, maxDepth=4)
+        self.assertEqual(("g8f6", 0), (moveToCoordinates(bestMove), score))
+
+    def test_stopFlag(self):
+        # run a worker in this process: only completing the last iteration stops the other workers
+        gs = gameStateFromFen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        with ParallelSearch(workers=1, sizeMB=1) as parallelSearch:
+            ParallelSearchModule.initializeWorker(parallelSearch.memory.name, 1)
+            try:
+                depth = ParallelSearchModule.searchWorker(gs.clone(), 0, 5, 100, None)[1]
+                self.assertLess(depth, 5)
+                self.assertEqual(0, parallelSearch.memory.buf[tableBytes(1)])
+                depth = ParallelSearchModule.searchWorker(gs.clone(), 0, 1, None, None)[1]
+                self.assertEqual(1, depth)
+                self.assertEqual(1, parallelSearch.memory.buf[tableBytes(1)])
+            finally:
+                ParallelSearchModule.workerSearch.tt.release()
+                ParallelSearchModule.workerMemory.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+from src.ChessEngine import START_FEN, GameState, Move
+from src.PawnEvaluation import PawnHashTable, evaluatePawns
+
+
+class TestPawnEvaluation(unittest.TestCase):
+
+    def setUp(self):
+        self.gs = GameState()
+
+    def test_pawnHash(self):
+        self.gs.setFen(START_FEN)
+        pawnHash = self.gs.pawnHash
+        self.assertEqual(pawnHash, self.gs.calculatePawnHash())
+        # moves of the other pieces don't change the pawn hash
+        self.gs.makeMove(Move((6, 7), (5, 5), self.gs))
+        self.assertEqual(pawnHash, self.gs.pawnHash)
+        self.gs.makeMove(Move((4, 1), (4, 3), self.gs))
+        self.assertNotEqual(pawnHash, self.gs.pawnHash)
+        self.assertEqual(self.gs.calculatePawnHash(), self.gs.pawnHash)
+        self.gs.undoMove()
+        self.assertEqual(pawnHash, self.gs.pawnHash)
+
+    def test_evaluatePawns(self):
+        # doubled and isolated pawns on the c column, isolated pawns on a and h, passed pawns on a, c4 and h
+        self.gs.setFen("4k3/8/8/7P/2P5/2P5/P7/4K3 w - - 0 1")
+        self.assertEqual((-25, -25), evaluatePawns(self.gs.bitboards["wp"], self.gs.bitboards["bp"]))
+        # the same structure with the colors swapped
+        self.gs.setFen("4k3/p7/2p5/2p5/7p/8/8/4K3 w - - 0 1")
+        self.assertEqual((25, 25), evaluatePawns(self.gs.bitboards["wp"], self.gs.bitboards["bp"]))
+        # a passed pawn on c4, a backward pawn on d3 and an isolated pawn on e5
+        self.gs.setFen("4k3/8/8/4p3/2P5/3P4/8/4K3 w - - 0 1")
+        self.assertEqual((12, 25), evaluatePawns(self.gs.bitboards["wp"], self.gs.bitboards["bp"]))
+
+    def test_pawnHashTable(self):
+        table = PawnHashTable(entries=1000)
+        self.assertEqual(512, len(table))
+        self.gs.setFen("4k3/8/8/4p3/2P5/3P4/8/4K3 w - - 0 1")
+        self.assertEqual((12, 25), table.probe(self.gs))
+        self.assertEqual((12, 25), table.probe(self.gs))
+        self.assertEqual((1, 1), (table.hits, table.misses))
+        self.assertEqual(0.5, table.hitRate())
+        # without pieces other than pawns the endgame score counts, from the point of view of the player to move
+        self.assertEqual(25, table.evaluate(self.gs))
+        self.gs.setWhiteToMove(False)
+        self.assertEqual(-25, table.evaluate(self.gs))
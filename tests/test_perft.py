@@ -0,0 +1,56 @@
+import contextlib
+import io
+import unittest
+from src.ChessEngine import gameStateFromFen, moveToCoordinates
+from src.Perft import POSITIONS, perft, divide, parallelDivide, main
+
+
+class TestPerft(unittest.TestCase):
+
+    def test_standardPositions(self):
+        for name, (fen, expectedCounts) in POSITIONS.items():
+            gs = gameStateFromFen(fen)
+            for depth in (1, 2):
+                with self.subTest(position=name, depth=depth):
+                    self.assertEqual(expectedCounts[depth - 1], perft(gs, depth))
+            # perft leaves the position as it was
+            self.assertEqual(gameStateFromFen(fen).hash, gs.hash)
+
+    def test_startPositionDepth3(self):
+        fen, expectedCounts = POSITIONS["start"]
+        self.assertEqual(expectedCounts[2], perft(gameStateFromFen(fen), 3))
+
+    def test_depthBelowOne(self):
+        gs = gameStateFromFen(POSITIONS["start"][0])
+        self.assertEqual(1, perft(gs, 0))
+        self.assertEqual(1, perft(gs, -1))
+        self.assertEqual([1] * 20, [nodes for move, nodes in divide(gs, 0)])
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            main(["--divide", "--depth", "0"])
+
+    def test_divide(self):
+        fen, expectedCounts = POSITIONS["kiwipete"]
+        counts = dict((moveToCoordinates(move), nodes) for move, nodes in divide(gameStateFromFen(fen), 2))
+        self.assertEqual(expectedCounts[0], len(counts))
+        self.assertEqual(expectedCounts[1], sum(counts.values()))
+        self.assertIn("e1g1", counts)  # castling
+        self.assertEqual(43, counts["e1g1"])
+
+    def test_parallelDivide(self):
+        fen, expectedCounts = POSITIONS["promotion"]
+        gs = gameStateFromFen(fen)
+        counts = parallelDivide(gs, 3, workers=2, useCache=True)
+        self.assertEqual(divide(gs, 3), counts)
+        self.assertEqual(expectedCounts[2], sum(nodes for move, nodes in counts))
+
+    def test_cache(self):
+        fen, expectedCounts = POSITIONS["endgame"]
+        cache = {}
+        self.assertEqual(expectedCounts[3], perft(gameStateFromFen(fen), 4, cache))
+        self.assertGreater(len(cache), 0)
+        # a second run is answered from the cache
+        self.assertEqual(expectedCounts[3], perft(gameStateFromFen(fen), 4, cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from src.ChessEngine import GameState
+from src.TranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, unpackMove, tableBytes
+
+
+class TestTranspositionTable(unittest.TestCase):
+
+    def setUp(self):
+        self.tt = TranspositionTable(sizeMB=1)
+
+    def test_size(self):
+        self.assertLessEqual(self.tt.sizeInBytes(), 1024 * 1024)
+        self.assertGreater(self.tt.sizeInBytes(), 512 * 1024)
+        self.assertLessEqual(TranspositionTable(sizeMB=3).sizeInBytes(), 3 * 1024 * 1024)
+
+    def test_storeAndProbe(self):
+        gs = GameState()
+        move = gs.validMoves[0]
+        self.assertIsNone(self.tt.probe(gs.hash))
+        self.tt.store(gs.hash, 4, -123, UPPER_BOUND, move)
+        depth, score, bound, bestMove = self.tt.probe(gs.hash)
+        self.assertEqual((4, -123, UPPER_BOUND), (depth, score, bound))
+        self.assertEqual((move.fromIndex, move.toIndex), unpackMove(bestMove))
+        self.assertEqual(1, self.tt.hits)
+        self.assertEqual(1, self.tt.misses)
+
+        # storing without a move keeps the known best move
+        self.tt.store(gs.hash, 5, 50, LOWER_BOUND)
+        self.assertEqual((5, 50, LOWER_BOUND, bestMove), self.tt.probe(gs.hash))
+
+    def test_replacement(self):
+        mask = self.tt.mask + 1
+        deep, shallow, other = 7, 7 + mask, 7 + 2 * mask  # all map to the same bucket
+        self.tt.store(deep, 8, 1, EXACT)
+        self.tt.store(shallow, 2, 2, EXACT)
+        # the deeper entry stays in the depth preferred slot, the shallow ones replace each other
+        self.assertEqual(8, self.tt.probe(deep)[0])
+        self.assertEqual(2, self.tt.probe(shallow)[0])
+        self.tt.store(other, 3, 3, EXACT)
+        self.assertIsNone(self.tt.probe(shallow))
+        self.assertEqual(1, self.tt.collisions)
+        self.assertEqual(8, self.tt.probe(deep)[0])
+
+        # entries of an old search are replaced even by shallower ones
+        self.tt.newSearch()
+        self.tt.store(shallow, 1, 4, EXACT)
+        self.assertIsNone(self.tt.probe(deep))
+        self.assertEqual((1, 4, EXACT, 0), self.tt.probe(shallow))
+
+    def test_sharedBuffer(self):
+        buffer = bytearray(tableBytes(1))
+        tt = TranspositionTable(1, buffer)
+        other = TranspositionTable(1, buffer)
+        tt.store(12345, 3, 77, EXACT)
+        self.assertEqual((3, 77, EXACT, 0), other.probe(12345))
+        # a torn entry, whose data doesn't belong to its key, matches no position
+        other.data[(12345 & other.mask) << 1] ^= 1
+        self.assertIsNone(tt.probe(12345))
+        tt.clear()
+        self.assertFalse(any(buffer))
+        tt.release()
+        other.release()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import random
+import tempfile
+import unittest
+
+try:
+    import numpy as np
+    from src.BatchEvaluation import randomGameStates
+    from src.Tuning import (Tuner, evaluateFeatures, featureMatrix, initialParameters, parametersToJson, parseLine,
+                            PARAMETERS)
+except ImportError:
+    np = None
+
+
+def placement(gs):
+    """
+    :return: the piece placement and the player to move of the position in Forsyth-Edwards Notation
+    """
+    rows = []
+    for row in gs.board:
+        text, vacant = "", 0
+        for piece in row:
+            if piece == "--":
+                vacant += 1
+                continue
+            if vacant:
+                text, vacant = text + str(vacant), 0
+            text += piece[1].upper() if piece[0] == 'w' else piece[1].lower()
+        rows.append(text + (str(vacant) if vacant else ""))
+    return "/".join(rows) + (" w" if gs.whiteToMove else " b")
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestTuning(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.gameStates = randomGameStates(120, seed=7)
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, "positions.txt")
+        rng = random.Random(7)
+        with open(cls.path, "w") as file:
+            for gs in cls.gameStates:
+                # the side ahead in material wins more often
+                score = gs.evaluate() if gs.whiteToMove else -gs.evaluate()
+                result = "1-0" if rng.random() < 1 / (1 + 10 ** (-score / 400)) else "0-1"
+                file.write(placement(gs) + " - - 0 1;" + result + "\n")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_parseLine(self):
+        pieces, result = parseLine("4k3/8/8/8/8/8/4P3/4K3 b - - 0 1;1/2-1/2\n")
+        self.assertEqual([("bK", 4), ("wp", 52), ("wK", 60)], pieces)
+        self.assertEqual(0.5, result)
+        self.assertEqual(0.25, parseLine("4k3/8/8/8/8/8/4P3/4K3 b;0.25")[1])
+        self.assertIsNone(parseLine("\n"))
+
+    def test_featuresMatchEvaluation(self):
+        positions = [parseLine(placement(gs) + ";1-0") for gs in self.gameStates]
+        rows, columns, weights, results = featureMatrix(positions)
+        scores = evaluateFeatures(rows, columns, weights, initialParameters(), len(positions))
+        expected = [gs.evaluate() if gs.whiteToMove else -gs.evaluate() for gs in self.gameStates]
+        # GameState.evaluate rounds down
+        self.assertTrue(np.all(np.abs(scores - expected) < 1))
+
+    def test_tune(self):
+        with Tuner(self.path, workers=1, chunkSize=50) as tuner:
+            error, gradient = tuner.errorAndGradient()
+            self.assertEqual((PARAMETERS,), gradient.shape)
+            tuner.tune(5)
+            self.assertLess(tuner.errorAndGradient()[0], error)
+            tables = parametersToJson(tuner.parameters)
+        self.assertEqual(64, len(tables["endgameTables"]["N"]))
+        # the chunks give the same error in worker processes
+        with Tuner(self.path, workers=2, chunkSize=50) as tuner:
+            self.assertAlmostEqual(error, tuner.errorAndGradient()[0])